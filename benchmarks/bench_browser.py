@@ -0,0 +1,493 @@
+"""Record/replay benchmarks of the browser stages.
+
+Run from the repository root:
+
+    # Record live sessions (needs cookies) into a HAR and fixture files
+    python -m benchmarks.bench_browser record --accounts georgehotz \
+        --har data/bench/replay.har
+    # Replay them, or synthetic accounts when there are no fixtures
+    python -m benchmarks.bench_browser [--har data/bench/replay.har]
+        [--accounts georgehotz] [--rounds 3] [--scroll-delay 0.2]
+
+Replay runs ``Page.fetch_account_data`` and
+``CollectFollowing.fetch_following_accounts`` fully offline through a
+``BrowserPool`` whose contexts route every request. Without ``--har``
+profiles are rendered from ``benchmarks/fixtures/replay/<account>.json``
+with a simulated infinite scroll: the next batch of posts (or followed
+accounts in the following dialog) is appended after each scroll to the
+bottom and old ones are dropped, as Instagram does. With ``--har`` the
+recorded responses are served instead and Instagram's own scripts load
+the next pages.
+
+Reports sessions (pages) per second, per-session p50/p99 latency and the
+memory of the Python process plus the browser processes, and writes the
+same JSON results as ``bench_crawler``, so ``bench_crawler --compare``
+works on them.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Set
+from datetime import datetime, timezone
+from pathlib import Path
+from random import Random
+from time import perf_counter
+import argparse
+import asyncio
+import json
+import os
+import platform
+
+from playwright.async_api import BrowserContext, Route
+
+from benchmarks.bench_crawler import get_commit, percentile, save_results
+from crawler.browser import BrowserPool
+from crawler.collect_account_data import Page, get_unique_id
+from crawler.collect_new_accounts import CollectFollowing
+from config.config import ROOT_DIR
+
+REPLAY_DIR = ROOT_DIR / "benchmarks" / "fixtures" / "replay"
+
+SHORTCODE_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ" \
+                     "abcdefghijklmnopqrstuvwxyz0123456789-_"
+
+PROFILE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8">
+<title>{account_name} on Instagram</title>
+<meta property="og:description" content="{follower_number} Followers, \
+{following_number} Following, {post_number} Posts - See Instagram photos \
+and videos from {account_name}">
+<style>
+.tile {{ display: inline-block; width: 300px; height: 300px; }}
+.row {{ height: 60px; }}
+#dialog {{ position: fixed; top: 10%; height: 400px; width: 400px;
+           overflow-y: scroll; background: #fff; }}
+</style></head>
+<body>
+<nav><img alt="viewer's profile picture" src="data:,"></nav>
+<header><img alt="{account_name}'s profile picture" src="data:,">
+<a href="/{account_name}/following/">{following_number} following</a>
+</header>
+<main id="posts"></main>
+<div id="dialog" hidden><div id="following"></div></div>
+<script>
+const replay = {replay_json};
+
+function makeFeed(items, container, keepBatches, render) {{
+  let shown = 0, loading = false;
+  function load() {{
+    const batch = items.slice(shown, shown + replay.batch_size);
+    for (const item of batch) container.appendChild(render(item));
+    shown += batch.length;
+    // Like Instagram's virtualized grid, only the last rows stay mounted.
+    while (container.children.length > replay.batch_size * keepBatches)
+      container.removeChild(container.firstChild);
+    loading = false;
+  }}
+  function more() {{
+    if (loading || shown >= items.length) return;
+    loading = true;
+    setTimeout(load, replay.load_delay_ms);
+  }}
+  return {{ load, more }};
+}}
+
+const posts = makeFeed(replay.post_ids, document.getElementById("posts"),
+  replay.keep_batches, postId => {{
+    const tile = document.createElement("a");
+    tile.className = "tile";
+    tile.href = postId;
+    return tile;
+  }});
+posts.load();
+window.addEventListener("scroll", () => {{
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 100)
+    posts.more();
+}});
+
+const dialog = document.getElementById("dialog");
+// The following dialog keeps every row, the crawler counts them.
+const following = makeFeed(replay.following,
+  document.getElementById("following"), Infinity, name => {{
+    const row = document.createElement("div");
+    row.className = "row";
+    const avatar = document.createElement("img");
+    avatar.alt = name + "'s profile picture";
+    avatar.src = "data:,";
+    row.appendChild(avatar);
+    return row;
+  }});
+document.querySelector('a[href$="/following/"]').addEventListener(
+  "click", event => {{
+    event.preventDefault();
+    dialog.hidden = false;
+    following.load();
+  }});
+dialog.addEventListener("scroll", () => {{
+  if (dialog.scrollTop + dialog.clientHeight >= dialog.scrollHeight - 100)
+    following.more();
+}});
+</script>
+</body></html>
+"""
+
+
+def make_fixture(account_name: str, posts: int, following: int,
+                 seed: int=0) -> Dict[str, Any]:
+    random = Random(f"{seed}-{account_name}")
+    post_ids = []
+    for _ in range(posts):
+        shortcode = "".join(random.choice(SHORTCODE_ALPHABET)
+                            for _ in range(11))
+        kind = "p" if random.random() < 0.8 else "reel"
+        post_ids.append(f"/{account_name}/{kind}/{shortcode}/")
+    return {
+        "account_name": account_name,
+        "follower_number": random.randint(1000, 10 ** 7),
+        "post_ids": post_ids,
+        "following": [f"{account_name}_follows_{number}"
+                      for number in range(following)],
+    }
+
+
+def load_fixtures(fixtures_dir: Path) -> Dict[str, Dict[str, Any]]:
+    fixtures = {}
+    for fixture_path in sorted(fixtures_dir.glob("*.json")):
+        with open(fixture_path, encoding="utf-8") as fixture_file:
+            fixture = json.load(fixture_file)
+        fixtures[fixture["account_name"]] = fixture
+    return fixtures
+
+
+def save_fixture(fixtures_dir: Path, fixture: Dict[str, Any]) -> None:
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    fixture_path = fixtures_dir / f"{fixture['account_name']}.json"
+    with open(fixture_path, "w", encoding="utf-8") as fixture_file:
+        json.dump(fixture, fixture_file, indent=2)
+
+
+def render_profile(fixture: Dict[str, Any], batch_size: int,
+                   keep_batches: int, load_delay: float) -> str:
+    replay = {
+        "post_ids": fixture["post_ids"],
+        "following": fixture["following"],
+        "batch_size": batch_size,
+        "keep_batches": keep_batches,
+        "load_delay_ms": int(load_delay * 1000),
+    }
+    return PROFILE_TEMPLATE.format(
+        account_name=fixture["account_name"],
+        follower_number=fixture["follower_number"],
+        following_number=len(fixture["following"]),
+        post_number=len(fixture["post_ids"]),
+        replay_json=json.dumps(replay).replace("</", "<\\/"))
+
+
+class FixtureRouter:
+    """Serves ``https://www.instagram.com/<account>/`` from the fixtures,
+    ``latency`` seconds after the request, and aborts everything else."""
+
+    def __init__(self, fixtures: Dict[str, Dict[str, Any]],
+                 batch_size: int=12, keep_batches: int=4,
+                 load_delay: float=0.05, latency: float=0.05):
+        self.pages = {
+            f"https://www.instagram.com/{account_name}/":
+                render_profile(fixture, batch_size, keep_batches, load_delay)
+            for account_name, fixture in fixtures.items()}
+        self.latency = latency
+
+    async def handle(self, route: Route) -> None:
+        page = self.pages.get(route.request.url)
+        if page is None:
+            await route.abort()
+            return
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        await route.fulfill(status=200, content_type="text/html",
+                            body=page)
+
+    async def install(self, context: BrowserContext) -> None:
+        await context.route("**/*", self.handle)
+
+
+def get_har_setup(har_path: str, update: bool=False)\
+        -> Callable[[BrowserContext], Awaitable[None]]:
+    async def install(context: BrowserContext) -> None:
+        await context.route_from_har(har_path, update=update,
+                                     update_content="embed",
+                                     not_found="fallback" if update
+                                     else "abort")
+    return install
+
+
+def get_process_memory(pid: int) -> int:
+    """Proportional set size in bytes (RSS where unavailable), so pages
+    shared between the browser processes are only counted once."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as smaps_file:
+            for line in smaps_file:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        with open(f"/proc/{pid}/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * \
+                os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def get_child_pids(root_pid: int) -> Set[int]:
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                # The command name can hold spaces, ppid follows it.
+                parent = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(parent, []).append(int(entry))
+
+    children, pending = set(), [root_pid]
+    while pending:
+        for child in parents.get(pending.pop(), []):
+            if child not in children:
+                children.add(child)
+                pending.append(child)
+    return children
+
+
+def get_memory() -> Dict[str, int]:
+    """Bytes used by this process and by its children, the Playwright
+    driver and the browser."""
+    if not os.path.isdir("/proc"):
+        return {"python": 0, "browser": 0}
+    return {
+        "python": get_process_memory(os.getpid()),
+        "browser": sum(get_process_memory(pid)
+                       for pid in get_child_pids(os.getpid())),
+    }
+
+
+async def replay_profile(pool: BrowserPool, fixture: Dict[str, Any],
+                         args: argparse.Namespace) -> bool:
+    account_name = fixture["account_name"]
+    async with pool.page() as page:
+        profile = Page(f"https://www.instagram.com/{account_name}/", page)
+        profile.scroll_delay = (args.scroll_delay, args.scroll_delay)
+        post_urls, follower_number = await profile.fetch_account_data(
+            account_name, max_scrolls=args.max_scrolls)
+
+    if not fixture["post_ids"]:
+        return bool(post_urls)
+    expected = {get_unique_id(post_id) for post_id in fixture["post_ids"]}
+    return {get_unique_id(post_url) for post_url in post_urls} == expected
+
+
+async def replay_following(pool: BrowserPool, fixture: Dict[str, Any],
+                           args: argparse.Namespace) -> bool:
+    account_name = fixture["account_name"]
+    async with pool.page() as page:
+        collector = CollectFollowing(
+            page, f"https://www.instagram.com/{account_name}/")
+        collector.open_delay = (args.scroll_delay, args.scroll_delay)
+        collector.scroll_delay = (args.scroll_delay, args.scroll_delay)
+        following = await collector.fetch_following_accounts(
+            account_name, max_scrolls=args.max_scrolls)
+
+    if not fixture["following"]:
+        return bool(following)
+    return {url.rstrip("/").split("/")[-1] for url in following} == \
+        set(fixture["following"])
+
+
+async def run_replay(name: str, replay: Callable[..., Awaitable[bool]],
+                     pool: BrowserPool,
+                     fixtures: Dict[str, Dict[str, Any]],
+                     args: argparse.Namespace) -> Dict[str, Any]:
+    memory_start = memory_peak = get_memory()
+
+    async def sample_memory() -> None:
+        nonlocal memory_peak
+        while True:
+            memory = get_memory()
+            memory_peak = {key: max(memory[key], memory_peak[key])
+                           for key in memory}
+            await asyncio.sleep(0.25)
+
+    async def timed(fixture: Dict[str, Any]) -> bool:
+        start_time = perf_counter()
+        try:
+            return await replay(pool, fixture, args)
+        except Exception as replay_error:
+            print(f"{name} Replay Of {fixture['account_name']} "
+                  f"Failed -> {replay_error}")
+            return False
+        finally:
+            latencies.append(perf_counter() - start_time)
+
+    latencies: List[float] = []
+    sampler = asyncio.create_task(sample_memory())
+    start_time = perf_counter()
+    try:
+        results = []
+        for _ in range(args.rounds):
+            results.extend(await asyncio.gather(
+                *[timed(fixture) for fixture in fixtures.values()]))
+    finally:
+        elapsed = perf_counter() - start_time
+        sampler.cancel()
+    memory_end = get_memory()
+
+    def mb(value: int) -> float:
+        return round(value / 2 ** 20, 1)
+
+    result = {
+        "name": name,
+        "items": len(results),
+        "ok": sum(results),
+        "seconds": round(elapsed, 4),
+        "throughput": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "rss_start_mb": mb(sum(memory_start.values())),
+        "rss_peak_mb": mb(sum(memory_peak.values())),
+        "rss_end_mb": mb(sum(memory_end.values())),
+        "browser_start_mb": mb(memory_start["browser"]),
+        "browser_peak_mb": mb(memory_peak["browser"]),
+        "browser_end_mb": mb(memory_end["browser"]),
+    }
+    print(f"{name:<12}{result['ok']:>5}/{result['items']:<5}"
+          f"{result['throughput']:>9.2f}/s{result['p50_ms']:>10.0f}"
+          f"{result['p99_ms']:>10.0f}{result['browser_start_mb']:>10.1f}MB"
+          f"{result['browser_peak_mb']:>10.1f}MB")
+    return result
+
+
+def get_replay_fixtures(args: argparse.Namespace)\
+        -> Dict[str, Dict[str, Any]]:
+    fixtures = load_fixtures(Path(args.fixtures))
+    if args.accounts:
+        fixtures = {account_name: fixtures.get(account_name) or {
+            "account_name": account_name, "follower_number": 0,
+            "post_ids": [], "following": []}
+            for account_name in args.accounts}
+    if not fixtures and not args.har:
+        fixtures = {f"bench_profile_{number}": make_fixture(
+            f"bench_profile_{number}", args.posts, args.following, args.seed)
+            for number in range(args.synthetic_accounts)}
+    return fixtures
+
+
+async def replay(args: argparse.Namespace) -> Dict[str, Any]:
+    fixtures = get_replay_fixtures(args)
+    if not fixtures:
+        raise SystemExit("No Accounts To Replay, Pass --accounts With --har")
+
+    if args.har:
+        context_setup = get_har_setup(args.har)
+    else:
+        context_setup = FixtureRouter(
+            fixtures, args.batch_size, args.keep_batches, args.load_delay,
+            args.latency).install
+
+    pool = BrowserPool(args.pool_size, args.contexts, args.page_max_uses,
+                       use_cookies=False, context_setup=context_setup)
+    print(f"{'benchmark':<12}{'ok/items':>11}{'sessions':>11}{'p50 ms':>10}"
+          f"{'p99 ms':>10}{'browser':>12}{'peak':>12}")
+    results = []
+    try:
+        await pool.start()
+        for name, replay_session in (("profile", replay_profile),
+                                     ("following", replay_following)):
+            if name in args.benchmarks:
+                results.append(await run_replay(name, replay_session, pool,
+                                                fixtures, args))
+    finally:
+        await pool.close()
+
+    return {
+        "commit": get_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("command", "output")},
+        "results": results,
+    }
+
+
+async def record(args: argparse.Namespace) -> None:
+    """Run both stages against live Instagram once per account, saving the
+    traffic to ``--har`` and the results as replay fixtures."""
+    Path(args.har).parent.mkdir(parents=True, exist_ok=True)
+    pool = BrowserPool(1, 1, context_setup=get_har_setup(args.har,
+                                                         update=True))
+    try:
+        await pool.start()
+        for account_name in args.accounts:
+            account_url = f"https://www.instagram.com/{account_name}/"
+            async with pool.page() as page:
+                post_urls, follower_number = await Page(
+                    account_url, page).fetch_account_data(account_name)
+            async with pool.page() as page:
+                following = await CollectFollowing(
+                    page, account_url).fetch_following_accounts(account_name)
+
+            save_fixture(Path(args.fixtures), {
+                "account_name": account_name,
+                "follower_number": follower_number,
+                "post_ids": [post_url.replace("https://www.instagram.com", "")
+                             for post_url in post_urls],
+                "following": [url.rstrip("/").split("/")[-1]
+                              for url in following],
+            })
+            print(f"Recorded {account_name} -> {len(post_urls)} Posts, "
+                  f"{len(following)} Following")
+    finally:
+        # The HAR is only written when its context closes.
+        for context in pool.contexts:
+            await context.close()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("command", nargs="?", default="replay",
+                            choices=("replay", "record"))
+    arg_parser.add_argument("--accounts", nargs="+", default=[],
+                            help="Accounts to record, or to replay from "
+                                 "--har")
+    arg_parser.add_argument("--har", help="HAR file to record to or replay")
+    arg_parser.add_argument("--fixtures", default=str(REPLAY_DIR))
+    arg_parser.add_argument("--benchmarks", nargs="+",
+                            default=["profile", "following"],
+                            choices=("profile", "following"))
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--pool-size", type=int, default=4)
+    arg_parser.add_argument("--contexts", type=int, default=2)
+    arg_parser.add_argument("--page-max-uses", type=int, default=50)
+    arg_parser.add_argument("--max-scrolls", type=int, default=100)
+    arg_parser.add_argument("--scroll-delay", type=float, default=0.2,
+                            help="Seconds waited after each scroll")
+    arg_parser.add_argument("--load-delay", type=float, default=0.05,
+                            help="Seconds the next batch takes to appear")
+    arg_parser.add_argument("--latency", type=float, default=0.05,
+                            help="Seconds before a profile page is served")
+    arg_parser.add_argument("--batch-size", type=int, default=12)
+    arg_parser.add_argument("--keep-batches", type=int, default=4)
+    arg_parser.add_argument("--synthetic-accounts", type=int, default=4)
+    arg_parser.add_argument("--posts", type=int, default=120)
+    arg_parser.add_argument("--following", type=int, default=100)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output")
+    args = arg_parser.parse_args()
+
+    if args.command == "record":
+        if not args.har or not args.accounts:
+            arg_parser.error("record needs --har and at least one account")
+        asyncio.run(record(args))
+    else:
+        report = asyncio.run(replay(args))
+        print(f"Results Written To {save_results(report, args.output)}")
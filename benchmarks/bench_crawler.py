@@ -0,0 +1,345 @@
+"""Offline crawler benchmarks against a local mock Instagram server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_crawler [--posts 200] [--rounds 3]
+        [--latency 0.02] [--error-rate 0.01] [--throttle-rate 0.01] [--db]
+    python -m benchmarks.bench_crawler --compare old.json new.json
+
+Measures throughput, p50/p99 latency and RSS of ``get_descriptions``,
+``ImageDownload.download``, ``Parser.get_post_ids`` and, with ``--db``,
+``WriteDB.write``. HTTP latencies are per request, the others per call.
+Results are written as JSON to ``data/bench/`` (or ``--output``), tagged
+with the current commit, so two runs can be compared with ``--compare``.
+
+``--db`` writes ``bench_*`` accounts and their posts into the configured
+database and deletes them afterwards, point ``DB_NAME`` at a scratch
+database.
+"""
+import os
+
+# Read by the crawler modules at import time: the mock server needs no
+# request rate limit, and cached responses would hide the HTTP path.
+os.environ.setdefault("REQUESTS_PER_SECOND", "0")
+os.environ.setdefault("RESPONSE_CACHE", "false")
+os.environ.setdefault("MEDIA_STORE_DIR", "data/bench/media")
+
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import subprocess
+
+import aiohttp
+
+from benchmarks.mock_server import MockServerProcess, FIXTURES_DIR
+from crawler import rate_control
+from crawler.collect_account_data import Parser
+from crawler.collect_post_descriptions import get_descriptions
+from crawler.http_client import get_http_client, close_http_client
+from crawler.install_content import ImageDownload
+from config.config import ROOT_DIR, MEDIA_STORE_DIR
+
+RESULTS_DIR = ROOT_DIR / "data" / "bench"
+
+BenchResult = Dict[str, Any]
+
+
+def get_rss() -> int:
+    """Current resident set size in bytes."""
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * \
+                os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def get_post_urls(base_url: str, prefix: str, count: int) -> List[str]:
+    return [f"{base_url}/bench_account/p/{prefix}{index:07d}/"
+            for index in range(count)]
+
+
+class ImageDownloadWithoutDB(ImageDownload):
+    # The media_files bookkeeping is DB work, measured by --db.
+    async def get_stored_paths(self, post_urls: List[str]) -> Dict[str, str]:
+        return {}
+
+    async def record_media_files(self) -> None:
+        pass
+
+
+async def bench_descriptions(args: argparse.Namespace,
+                             server: MockServerProcess) -> BenchResult:
+    items, ok = 0, 0
+    for round_number in range(args.rounds):
+        post_urls = get_post_urls(server.base_url, f"d{round_number}-",
+                                  args.posts)
+        descriptions = await get_descriptions(post_urls)
+        items += len(post_urls)
+        ok += sum(1 for description in descriptions.values() if description)
+    return {"items": items, "ok": ok,
+            "latencies": list(get_http_client().stats.latencies)}
+
+
+async def bench_image_download(args: argparse.Namespace,
+                               server: MockServerProcess) -> BenchResult:
+    download_class = ImageDownload if args.db else ImageDownloadWithoutDB
+    items, ok = 0, 0
+    for round_number in range(args.rounds):
+        post_urls = get_post_urls(server.base_url, f"i{round_number}-",
+                                  args.posts)
+        # Without posts_meta every image costs a post page and an image
+        # request, as for posts the meta stage missed.
+        image_paths = await download_class(post_urls).download()
+        items += len(post_urls)
+        ok += sum(1 for image_path in image_paths.values() if image_path)
+    return {"items": items, "ok": ok,
+            "latencies": list(get_http_client().stats.latencies)}
+
+
+async def bench_post_ids(args: argparse.Namespace,
+                         server: MockServerProcess) -> BenchResult:
+    content = (FIXTURES_DIR / "profile_page.html").read_text(
+        encoding="utf-8", errors="replace")
+    latencies, post_ids = [], []
+    for _ in range(args.parse_rounds):
+        start_time = perf_counter()
+        post_ids = Parser(content).get_post_ids("georgehotz")
+        latencies.append(perf_counter() - start_time)
+    return {"items": args.parse_rounds, "ok": args.parse_rounds,
+            "latencies": latencies, "post_ids": len(post_ids)}
+
+
+async def bench_write_db(args: argparse.Namespace,
+                         server: MockServerProcess) -> BenchResult:
+    from db.create_table import CreateDB
+    from db.write_data import WriteDB
+
+    await CreateDB().create()
+    posts_per_account = max(args.posts // args.accounts, 1)
+    latencies, items, ok = [], 0, 0
+    try:
+        for round_number in range(args.rounds):
+            account_data = {}
+            for account_number in range(args.accounts):
+                account_name = f"bench_{account_number}"
+                account_data[(account_name, 1000 + account_number)] = {
+                    f"https://www.instagram.com/{account_name}/p/"
+                    f"w{round_number}-{post_number:07d}/":
+                        [True, "", f"Caption {post_number}"]
+                    for post_number in range(posts_per_account)}
+
+            rows = args.accounts * (posts_per_account + 1)
+            start_time = perf_counter()
+            written = await WriteDB().write(account_data)
+            latencies.append(perf_counter() - start_time)
+            items += rows
+            ok += rows if written else 0
+    finally:
+        await delete_bench_rows()
+    return {"items": items, "ok": ok, "latencies": latencies}
+
+
+async def delete_bench_rows() -> None:
+    from db import DB, close_db_pool
+
+    bench_accounts = ("bench\\_%",)
+    async with DB().get_conn() as conn, conn.cursor() as cursor:
+        await cursor.execute("""
+            DELETE FROM posts WHERE account_id IN
+            (SELECT id FROM accounts WHERE account_name LIKE %s);
+            """, bench_accounts)
+        await cursor.execute(
+            "DELETE FROM accounts WHERE account_name LIKE %s;",
+            bench_accounts)
+    await close_db_pool()
+
+
+async def get_server_stats(server: MockServerProcess) -> Dict[str, int]:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{server.base_url}/_stats") as response:
+            return await response.json()
+
+
+async def reset_clients() -> None:
+    await close_http_client()
+    # The AIMD limits and open circuits of one benchmark don't carry over.
+    rate_control.rate_controllers.clear()
+
+
+async def run_benchmark(name: str,
+                        bench: Callable[..., Awaitable[BenchResult]],
+                        args: argparse.Namespace,
+                        server: MockServerProcess) -> BenchResult:
+    await reset_clients()
+    server_before = await get_server_stats(server)
+    rss_start = rss_peak = get_rss()
+
+    async def sample_rss() -> None:
+        nonlocal rss_peak
+        while True:
+            rss_peak = max(rss_peak, get_rss())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample_rss())
+    start_time = perf_counter()
+    try:
+        result = await bench(args, server)
+    finally:
+        elapsed = perf_counter() - start_time
+        sampler.cancel()
+        rss_peak = max(rss_peak, get_rss())
+        await reset_clients()
+    server_after = await get_server_stats(server)
+
+    latencies = result.pop("latencies")
+    result.update({
+        "name": name,
+        "seconds": round(elapsed, 4),
+        "throughput": round(result["ok"] / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "rss_start_mb": round(rss_start / 2 ** 20, 1),
+        "rss_peak_mb": round(rss_peak / 2 ** 20, 1),
+        "rss_end_mb": round(get_rss() / 2 ** 20, 1),
+        "server": {key: server_after[key] - server_before[key]
+                   for key in server_after},
+    })
+    print(f"{name:<18}{result['ok']:>7}/{result['items']:<7}"
+          f"{result['throughput']:>10.1f}/s{result['p50_ms']:>10.2f}"
+          f"{result['p99_ms']:>10.2f}{result['rss_peak_mb']:>9.1f}MB")
+    return result
+
+
+BENCHMARKS = {
+    "descriptions": bench_descriptions,
+    "image_download": bench_image_download,
+    "post_ids": bench_post_ids,
+    "write_db": bench_write_db,
+}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    server = MockServerProcess(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+        image_size=args.image_size, compress=args.compress, seed=args.seed)
+    server.start()
+    names = args.benchmarks or [name for name in BENCHMARKS
+                                if name != "write_db" or args.db]
+    print(f"{'benchmark':<18}{'ok/items':>15}{'throughput':>12}"
+          f"{'p50 ms':>10}{'p99 ms':>10}{'peak RSS':>11}")
+    results = []
+    try:
+        for name in names:
+            results.append(await run_benchmark(name, BENCHMARKS[name],
+                                               args, server))
+    finally:
+        server.close()
+        shutil.rmtree(os.path.join(ROOT_DIR, MEDIA_STORE_DIR),
+                      ignore_errors=True)
+
+    return {
+        "commit": get_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("compare", "output")},
+        "results": results,
+    }
+
+
+def save_results(report: Dict[str, Any], output: Optional[str]) -> str:
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        created_at = datetime.now(timezone.utc)
+        output = str(RESULTS_DIR / f"{created_at:%Y%m%dT%H%M%S}-"
+                                   f"{report['commit']}.json")
+    with open(output, "w", encoding="utf-8") as results_file:
+        json.dump(report, results_file, indent=2)
+    return output
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path, encoding="utf-8") as old_file:
+        old = {result["name"]: result
+               for result in json.load(old_file)["results"]}
+    with open(new_path, encoding="utf-8") as new_file:
+        new_report = json.load(new_file)
+
+    def change(old_value: float, new_value: float) -> str:
+        return f"{(new_value / old_value - 1) * 100:+.1f}%" \
+            if old_value else "n/a"
+
+    print(f"{'benchmark':<18}{'throughput':>12}{'p50':>10}{'p99':>10}"
+          f"{'peak RSS':>10}")
+    for result in new_report["results"]:
+        before = old.get(result["name"])
+        if before is None:
+            continue
+        print(f"{result['name']:<18}"
+              f"{change(before['throughput'], result['throughput']):>12}"
+              f"{change(before['p50_ms'], result['p50_ms']):>10}"
+              f"{change(before['p99_ms'], result['p99_ms']):>10}"
+              f"{change(before['rss_peak_mb'], result['rss_peak_mb']):>10}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("benchmarks", nargs="*",
+                            help=f"Any of {', '.join(BENCHMARKS)}, all "
+                                 f"by default")
+    arg_parser.add_argument("--posts", type=int, default=200,
+                            help="Posts per round")
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--parse-rounds", type=int, default=20)
+    arg_parser.add_argument("--accounts", type=int, default=10,
+                            help="Accounts per WriteDB round")
+    arg_parser.add_argument("--latency", type=float, default=0.02)
+    arg_parser.add_argument("--jitter", type=float, default=0.01)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--throttle-rate", type=float, default=0.0)
+    arg_parser.add_argument("--retry-after", type=float, default=0.1)
+    arg_parser.add_argument("--image-size", type=int, default=65536)
+    arg_parser.add_argument("--compress", action="store_true",
+                            help="Serve gzipped pages")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--db", action="store_true",
+                            help="Also benchmark WriteDB (needs Postgres)")
+    arg_parser.add_argument("--output")
+    arg_parser.add_argument("--compare", nargs=2,
+                            metavar=("OLD_JSON", "NEW_JSON"))
+    args = arg_parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        arg_parser.error(f"Unknown Benchmarks -> {', '.join(unknown)}")
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = asyncio.run(run(args))
+        print(f"Results Written To {save_results(report, args.output)}")
@@ -0,0 +1,77 @@
+"""Compare head-only og: extraction with the full BeautifulSoup parse.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_meta_parser [--repeat 20] [fixture.html ...]
+
+Without arguments every ``*.html`` file in ``benchmarks/fixtures`` is used.
+Saved Instagram pages can be dropped in that directory to benchmark real
+markup.
+"""
+from typing import Callable, Dict, List
+from time import perf_counter
+from pathlib import Path
+import argparse
+
+from bs4 import BeautifulSoup
+
+from crawler.meta_parser import extract_og_meta, HeadMetaParser
+from config.config import ROOT_DIR
+
+FIXTURES_DIR = ROOT_DIR / "benchmarks" / "fixtures"
+
+
+def soup_og_meta(html_code: str) -> Dict[str, str]:
+    soup = BeautifulSoup(html_code, "html.parser")
+    og = {}
+    for meta_tag in soup.find_all("meta", property=True):
+        prop = meta_tag["property"]
+        if prop.startswith("og:") and meta_tag.has_attr("content"):
+            og.setdefault(prop, meta_tag["content"])
+    return og
+
+
+def streamed_og_meta(html_bytes: bytes, chunk_size: int=16384)\
+        -> Dict[str, str]:
+    parser = HeadMetaParser()
+    for i in range(0, len(html_bytes), chunk_size):
+        if parser.feed(html_bytes[i:i + chunk_size]):
+            break
+    return parser.close()
+
+
+def measure(func: Callable, arg, repeat: int) -> float:
+    func(arg)
+    start_time = perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (perf_counter() - start_time) / repeat
+
+
+def run(fixtures: List[Path], repeat: int) -> None:
+    print(f"{'fixture':<24}{'size':>9}{'soup ms':>10}{'head ms':>10}"
+          f"{'stream ms':>11}{'speedup':>9}")
+    for fixture in fixtures:
+        html_bytes = fixture.read_bytes()
+        html_code = html_bytes.decode("utf-8", errors="replace")
+
+        expected = soup_og_meta(html_code)
+        if extract_og_meta(html_code) != expected or \
+                streamed_og_meta(html_bytes) != expected:
+            print(f"{fixture.name}: og: maps differ from BeautifulSoup!")
+
+        soup_time = measure(soup_og_meta, html_code, repeat)
+        head_time = measure(extract_og_meta, html_code, repeat)
+        stream_time = measure(streamed_og_meta, html_bytes, repeat)
+        print(f"{fixture.name:<24}{len(html_bytes) // 1024:>7}KB"
+              f"{soup_time * 1000:>10.2f}{head_time * 1000:>10.3f}"
+              f"{stream_time * 1000:>11.3f}{soup_time / head_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("fixtures", nargs="*", type=Path)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    run(args.fixtures or sorted(FIXTURES_DIR.glob("*.html")), args.repeat)
@@ -0,0 +1,203 @@
+"""Local aiohttp stand-in for Instagram and its CDN.
+
+Serves the recorded pages in ``benchmarks/fixtures`` as post and profile
+pages and generates image bytes, with configurable latency, 5xx error rate
+and 429 injection. Run it on its own to point the crawler at it by hand:
+
+    python -m benchmarks.mock_server [--port 8080] [--latency 0.05]
+"""
+from random import Random
+from typing import Any, Dict, Optional, Tuple
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import re
+
+from aiohttp import web
+
+from config.config import ROOT_DIR
+
+FIXTURES_DIR = ROOT_DIR / "benchmarks" / "fixtures"
+
+OG_IMAGE_PATTERN = re.compile(rb'(<meta property="og:image" content=")[^"]*"')
+
+
+def split_og_image(page: bytes) -> Tuple[bytes, bytes]:
+    """Page bytes before and after the ``og:image`` URL."""
+    match = OG_IMAGE_PATTERN.search(page)
+    if match is None:
+        raise ValueError("Fixture Has No og:image Meta Tag")
+    return page[:match.end(1)], page[match.end() - 1:]
+
+
+def get_image_bytes(name: str, size: int) -> bytes:
+    # Different for every name, so the media store doesn't dedupe them.
+    digest = hashlib.sha256(name.encode("utf-8")).digest()
+    return (digest * (size // len(digest) + 1))[:size]
+
+
+class MockInstagram:
+    """``/<account>/p/<id>/`` and ``/<account>/reel/<id>/`` serve the post
+    fixture with its ``og:image`` pointing at ``/media/<id>.jpg``,
+    ``/<account>/`` serves the profile fixture.
+
+    Every request first waits ``latency`` (plus up to ``jitter``) seconds,
+    then fails with a 500 with probability ``error_rate`` or a 429 with
+    ``Retry-After: retry_after`` with probability ``throttle_rate``.
+    Pages are gzipped when ``compress`` is set, which costs the server
+    about as much CPU as the crawler spends on them.
+    """
+
+    def __init__(self, latency: float=0.0, jitter: float=0.0,
+                 error_rate: float=0.0, throttle_rate: float=0.0,
+                 retry_after: float=0.1, image_size: int=65536,
+                 compress: bool=False, seed: int=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.image_size = image_size
+        self.compress = compress
+        self.random = Random(seed)
+
+        self.post_head, self.post_tail = split_og_image(
+            (FIXTURES_DIR / "post_page.html").read_bytes())
+        self.profile_page = (FIXTURES_DIR / "profile_page.html").read_bytes()
+
+        self.base_url = ""
+        self.runner: Optional[web.AppRunner] = None
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0,
+                                      "throttled": 0}
+
+    def get_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.inject_faults])
+        app.router.add_get("/_stats", self.get_stats)
+        app.router.add_get("/media/{name}", self.image)
+        app.router.add_get("/{account}/p/{post_id}/", self.post)
+        app.router.add_get("/{account}/reel/{post_id}/", self.post)
+        app.router.add_get("/{account}/", self.profile)
+        return app
+
+    @web.middleware
+    async def inject_faults(self, request: web.Request, handler)\
+            -> web.StreamResponse:
+        if request.path == "/_stats":
+            return await handler(request)
+
+        self.stats["requests"] += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        draw = self.random.random()
+        if draw < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=500)
+        if draw < self.error_rate + self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.Response(status=429,
+                                headers={"Retry-After": str(self.retry_after)})
+        return await handler(request)
+
+    def html(self, body: bytes) -> web.Response:
+        response = web.Response(body=body, content_type="text/html",
+                                charset="utf-8")
+        if self.compress:
+            response.enable_compression()
+        return response
+
+    async def post(self, request: web.Request) -> web.Response:
+        image_url = f"{self.base_url}/media/" \
+                    f"{request.match_info['post_id']}.jpg"
+        return self.html(self.post_head + image_url.encode("utf-8") +
+                         self.post_tail)
+
+    async def profile(self, request: web.Request) -> web.Response:
+        return self.html(self.profile_page)
+
+    async def image(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=get_image_bytes(request.match_info["name"], self.image_size),
+            content_type="image/jpeg")
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def start(self, host: str="127.0.0.1", port: int=0) -> str:
+        self.runner = web.AppRunner(self.get_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def close(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+async def serve(options: Dict[str, Any], host: str="127.0.0.1",
+                port: int=0,
+                url_queue: Optional[multiprocessing.Queue]=None) -> None:
+    server = MockInstagram(**options)
+    base_url = await server.start(host, port)
+    if url_queue is not None:
+        url_queue.put(base_url)
+    else:
+        print(f"Mock Instagram Serving On {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def run_server(options: Dict[str, Any],
+               url_queue: multiprocessing.Queue) -> None:
+    asyncio.run(serve(options, url_queue=url_queue))
+
+
+class MockServerProcess:
+    """``MockInstagram`` in a child process, so serving (and compressing)
+    the pages doesn't compete with the benchmarked code for the event loop
+    and the GIL. ``options`` are ``MockInstagram`` arguments.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.process: Optional[multiprocessing.Process] = None
+        self.base_url = ""
+
+    def start(self, timeout: float=30) -> str:
+        url_queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=run_server, args=(self.options, url_queue), daemon=True)
+        self.process.start()
+        self.base_url = url_queue.get(timeout=timeout)
+        return self.base_url
+
+    def close(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--latency", type=float, default=0.0)
+    arg_parser.add_argument("--jitter", type=float, default=0.0)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--throttle-rate", type=float, default=0.0)
+    arg_parser.add_argument("--compress", action="store_true")
+    args = arg_parser.parse_args()
+    asyncio.run(serve({"latency": args.latency, "jitter": args.jitter,
+                       "error_rate": args.error_rate,
+                       "throttle_rate": args.throttle_rate,
+                       "compress": args.compress},
+                      args.host, args.port))
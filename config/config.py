@@ -1,3 +1,70 @@
+import os
 from pathlib import Path
 
-ROOT_DIR = Path(__file__).resolve().parent.parent
\ No newline at end of file
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 10))
+BROWSER_CONTEXTS = int(os.getenv("BROWSER_CONTEXTS", 2))
+BROWSER_PAGE_MAX_USES = int(os.getenv("BROWSER_PAGE_MAX_USES", 50))
+
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "thread")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", 4))
+
+REQUESTS_PER_SECOND = float(os.getenv("REQUESTS_PER_SECOND", 8))
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", 60))
+HTTP_ITEM_TIMEOUT = float(os.getenv("HTTP_ITEM_TIMEOUT", 300))
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", HTTP_CONCURRENCY * 2))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST",
+                                         HTTP_CONCURRENCY))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", 60))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", 300))
+HTTP_COOKIES = os.getenv("HTTP_COOKIES", "false").lower() == "true"
+HTTP_DRAIN_BYTES = int(os.getenv("HTTP_DRAIN_KB", 1024)) * 1024
+VIDEO_CONCURRENCY = int(os.getenv("VIDEO_CONCURRENCY", 40))
+VIDEO_ITEM_TIMEOUT = float(os.getenv("VIDEO_ITEM_TIMEOUT", 600))
+
+MEDIA_STORE_DIR = os.getenv("MEDIA_STORE_DIR", "data/media")
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH",
+                                "data/cache/responses.sqlite")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", 256)) \
+    * 1024 * 1024
+
+RATE_MAX_CONCURRENCY = int(os.getenv("RATE_MAX_CONCURRENCY", HTTP_CONCURRENCY))
+RATE_MAX_RETRIES = int(os.getenv("RATE_MAX_RETRIES", 3))
+RATE_BACKOFF_BASE = float(os.getenv("RATE_BACKOFF_BASE", 1))
+RATE_BACKOFF_MAX = float(os.getenv("RATE_BACKOFF_MAX", 60))
+RATE_SLOW_SECONDS = float(os.getenv("RATE_SLOW_SECONDS", 5))
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", 10))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", 120))
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 4))
+
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", 900))
+CLAIM_BATCH_SIZE = int(os.getenv("CLAIM_BATCH_SIZE", BROWSER_POOL_SIZE))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", CLAIM_BATCH_SIZE))
+POSTS_PARTITIONS = int(os.getenv("POSTS_PARTITIONS", 0))
+
+INCREMENTAL_CRAWL = os.getenv("INCREMENTAL_CRAWL", "true").lower() == "true"
+
+SEEN_SET_ERROR_RATE = float(os.getenv("SEEN_SET_ERROR_RATE", 0.001))
+SEEN_SET_MIN_CAPACITY = int(os.getenv("SEEN_SET_MIN_CAPACITY", 1000000))
+
+RECRAWL_AGE_DAYS = float(os.getenv("RECRAWL_AGE_DAYS", 30))
+
+MIN_FOLLOWERS = int(os.getenv("MIN_FOLLOWERS", 1000))
+PRESCORE_BATCH_SIZE = int(os.getenv("PRESCORE_BATCH_SIZE", 200))
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "data/export")
+EXPORT_SHARD_SIZE = int(os.getenv("EXPORT_SHARD_SIZE", 10000))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", os.cpu_count() or 4))
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "jsonl")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 10000))
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 100000))
+EXPORT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "")
+EXPORT_SAFETY_SECONDS = float(os.getenv("EXPORT_SAFETY_SECONDS", 60))
@@ -4,6 +4,7 @@ import json
 from utils.logger import get_logger
 from config.config import ROOT_DIR
 from cookies.save_account_cookies import login
+from utils.metrics import COOKIES_VALID, LOGINS
 
 logger = get_logger("cookies_logger")
 
@@ -19,13 +20,16 @@ def check_login() -> bool:
         except Exception as cookies_error:
             logger.error(f"Cookies aren't in right format! -> "
                          f"{cookies_error}")
+            COOKIES_VALID.set(0)
             return False
 
     for cookies in cookies_data:
         if isinstance(cookies, dict) and cookies.get("name") == "ds_user_id":
+            COOKIES_VALID.set(1)
             return True
 
     logger.warning(f"Cookies expired or couldn't login account!")
+    COOKIES_VALID.set(0)
     return False
 
 async def handle_cookies() -> bool:
@@ -36,6 +40,7 @@ async def handle_cookies() -> bool:
     else:
         logger.info("Account cookies missing, logging account")
         login_result = await login()
+        LOGINS.inc(result="ok" if login_result else "failed")
         return login_result
 
 
@@ -0,0 +1,204 @@
+from typing import (Awaitable, Callable, Dict, Optional, AsyncIterator,
+                    Tuple)
+from contextlib import asynccontextmanager
+import os
+import json
+import asyncio
+
+from playwright.async_api import (async_playwright, BrowserContext,
+                                  Page as PlaywrightPage)
+
+from utils.logger import get_logger
+from utils.metrics import BROWSER_PAGES, BROWSER_LAUNCHES
+from config.config import (ROOT_DIR, BROWSER_POOL_SIZE, BROWSER_CONTEXTS,
+                           BROWSER_PAGE_MAX_USES)
+
+logger = get_logger("crawler_logger")
+
+
+def get_cookies(cookies_path: str=ROOT_DIR/"cookies/cookies.json"):
+    if not os.path.exists(cookies_path):
+        raise ModuleNotFoundError(
+            "Cookies Not Found. First Run save_account_cookies.py script!")
+
+    with open(cookies_path, "r") as json_file:
+        cookies = json.load(json_file)
+    return cookies
+
+
+class PooledPage:
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.page: Optional[PlaywrightPage] = None
+        self.generation = 0
+        self.uses = 0
+
+
+class BrowserPool:
+    """One long-lived Chromium shared by every crawler stage.
+
+    Contexts are created once with the account cookies loaded and a fixed
+    number of page slots is handed out through a queue. Pages are reset and
+    reused between navigations, recreated after ``max_page_uses`` and the
+    browser is relaunched whenever it is found disconnected.
+
+    ``context_setup`` is awaited with every new context, e.g. to install
+    request routes, and ``use_cookies=False`` skips the account cookies.
+    """
+
+    def __init__(self, size: int=BROWSER_POOL_SIZE,
+                 contexts_number: int=BROWSER_CONTEXTS,
+                 max_page_uses: int=BROWSER_PAGE_MAX_USES,
+                 use_cookies: bool=True,
+                 context_setup: Optional[
+                     Callable[[BrowserContext], Awaitable[None]]]=None):
+        self.size = max(size, 1)
+        self.contexts_number = max(min(contexts_number, self.size), 1)
+        self.max_page_uses = max_page_uses
+        self.use_cookies = use_cookies
+        self.context_setup = context_setup
+
+        self.playwright = None
+        self.browser = None
+        self.contexts = []
+        self.generation = 0
+        self.slots: asyncio.Queue = asyncio.Queue()
+        self.launch_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        self.playwright = await async_playwright().start()
+        await self.launch()
+        BROWSER_PAGES.set_function(self.get_page_counts)
+        for slot in range(self.size):
+            self.slots.put_nowait(PooledPage(slot))
+
+    async def launch(self) -> None:
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception as close_error:
+                logger.error(f"Error Occurred While Closing "
+                             f"Crashed Browser -> {close_error}")
+
+        self.browser = await self.playwright.chromium.launch(headless=True)
+        cookies = get_cookies() if self.use_cookies else []
+        self.contexts = []
+        for _ in range(self.contexts_number):
+            context = await self.browser.new_context()
+            if cookies:
+                await context.add_cookies(cookies)
+            if self.context_setup is not None:
+                await self.context_setup(context)
+            self.contexts.append(context)
+
+        self.generation += 1
+        BROWSER_LAUNCHES.inc()
+        logger.info(f"Browser Launched With {self.contexts_number} Contexts "
+                    f"And {self.size} Page Slots!")
+
+    def get_page_counts(self) -> Dict[Tuple[str], int]:
+        return {
+            ("open",): sum(len(context.pages) for context in self.contexts),
+            ("in_use",): self.size - self.slots.qsize(),
+        }
+
+    def is_healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    async def check_health(self) -> None:
+        if self.is_healthy():
+            return
+
+        async with self.launch_lock:
+            if not self.is_healthy():
+                logger.warning("Browser Is Disconnected, Relaunching...")
+                await self.launch()
+
+    def is_usable(self, pooled: PooledPage) -> bool:
+        return (pooled.page is not None
+                and pooled.generation == self.generation
+                and not pooled.page.is_closed()
+                and pooled.uses < self.max_page_uses)
+
+    async def discard_page(self, pooled: PooledPage) -> None:
+        if pooled.page and pooled.generation == self.generation:
+            try:
+                await pooled.page.close()
+            except Exception as close_error:
+                logger.error(f"Error Occurred While Closing Page -> "
+                             f"{close_error}")
+        pooled.page = None
+
+    async def prepare_page(self, pooled: PooledPage) -> PlaywrightPage:
+        if self.is_usable(pooled):
+            return pooled.page
+
+        await self.discard_page(pooled)
+        context = self.contexts[pooled.slot % len(self.contexts)]
+        pooled.page = await context.new_page()
+        pooled.generation = self.generation
+        pooled.uses = 0
+        return pooled.page
+
+    async def release(self, pooled: PooledPage) -> None:
+        pooled.uses += 1
+        try:
+            if self.is_usable(pooled):
+                await pooled.page.goto("about:blank")
+            else:
+                await self.discard_page(pooled)
+
+        except Exception as release_error:
+            logger.error(f"Error Occurred While Recycling Page -> "
+                         f"{release_error}")
+            pooled.page = None
+
+        finally:
+            self.slots.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[PlaywrightPage]:
+        pooled = await self.slots.get()
+        try:
+            await self.check_health()
+            page = await self.prepare_page(pooled)
+        except Exception:
+            pooled.page = None
+            self.slots.put_nowait(pooled)
+            raise
+
+        try:
+            yield page
+        finally:
+            await self.release(pooled)
+
+    async def close(self) -> None:
+        BROWSER_PAGES.set_function(None)
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+        self.browser, self.playwright = None, None
+        logger.info("Browser Pool Closed!")
+
+
+browser_pool: Optional[BrowserPool] = None
+browser_pool_lock = asyncio.Lock()
+
+
+async def get_browser_pool() -> BrowserPool:
+    global browser_pool
+    async with browser_pool_lock:
+        if browser_pool is None:
+            pool = BrowserPool()
+            await pool.start()
+            browser_pool = pool
+    return browser_pool
+
+
+async def close_browser_pool() -> None:
+    global browser_pool
+    if browser_pool is not None:
+        await browser_pool.close()
+        browser_pool = None
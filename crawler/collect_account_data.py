@@ -1,29 +1,23 @@
-from typing import List, Dict, Tuple
-import os
-import json
+from typing import List, Dict, Tuple, Set, Optional
 import asyncio
+import re
 from random import uniform
 
-from playwright.async_api import async_playwright
+from playwright.async_api import Page as PlaywrightPage
 from bs4 import BeautifulSoup
 
+from crawler.meta_parser import get_meta_content
+from crawler.parse_executor import run_parse
+from crawler.rate_control import get_rate_controller, check_status
+from crawler.browser import BrowserPool, get_browser_pool, close_browser_pool
 from utils.logger import get_logger
-from config.config import ROOT_DIR
+from utils.metrics import track_request
 
 logger = get_logger("crawler_logger")
 
 
-def get_cookies(cookies_path: str=ROOT_DIR/"cookies/cookies.json"):
-    if not os.path.exists(cookies_path):
-        raise ModuleNotFoundError("Cookies Not Found. First Run save_account_cookies.py script!")
-
-    with open(cookies_path, "r") as json_file:
-        cookies = json.load(json_file)
-    return cookies
-
-
 def turn_into_number(num_text: str) -> int:
-    num_text = num_text.replace(",", "")
+    num_text = num_text.replace(",", "").strip()
     num_dict = {
         "K": 3,
         "M": 6,
@@ -31,38 +25,52 @@ def turn_into_number(num_text: str) -> int:
     }
     for n in num_dict:
         if n in num_text:
-            num_text = num_text.replace(n, "0" * num_dict[n])
-            break
+            return round(float(num_text.replace(n, "")) * 10 ** num_dict[n])
 
     return int(num_text)
 
 
-class Chromium:
-    def __init__(self, pl):
-        self.pl = pl
+COUNTS_RE = re.compile(r"([\d.,]+[KMB]?) Followers, ([\d.,]+[KMB]?) "
+                       r"Following, ([\d.,]+[KMB]?) Posts")
+
+
+def parse_profile_counts(og_description: Optional[str])\
+        -> Tuple[Optional[int], Optional[int]]:
+    match = COUNTS_RE.search(og_description or "")
+    if not match:
+        return None, None
+    return turn_into_number(match.group(1)), turn_into_number(match.group(3))
+
+
+SHORTCODE_ALPHABET = ("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+                      "0123456789-_")
+
 
-    async def load_cookies(self):
-        cookies = get_cookies()
-        await self.context.add_cookies(cookies)
+def shortcode_to_media_id(shortcode: str) -> int:
+    # Shortcodes are base64 encoded media ids, which grow with post time.
+    media_id = 0
+    for char in shortcode[:11]:
+        media_id = media_id * 64 + SHORTCODE_ALPHABET.index(char)
+    return media_id
 
-    async def initialize(self):
-        self.browser = await self.pl.chromium.launch(headless=True)
-        self.context = await self.browser.new_context()
-        await self.load_cookies()
 
-    async def close(self):
-        await self.browser.close()
+def get_unique_id(post_url: str) -> str:
+    return post_url.rstrip("/").split("/")[-1]
 
 
 class Parser:
     def __init__(self, content: str):
-        self.soup = BeautifulSoup(content, "html.parser")
+        self.content = content
+        self._soup = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.content, "html.parser")
+        return self._soup
 
     def get_follower_meta(self):
-        meta_tag = self.soup.find('meta', property='og:description')
-        if meta_tag:
-            return meta_tag["content"]
-        return None
+        return get_meta_content(self.content, "og:description")
 
     def get_follower_number(self) -> int:
         try:
@@ -88,56 +96,95 @@ class Parser:
         return [element["href"] for element in elements]
 
 
+def parse_follower_number(content: str) -> int:
+    return Parser(content).get_follower_number()
+
+
+def parse_post_ids(content: str, account_name: str) -> List[str]:
+    return Parser(content).get_post_ids(account_name)
+
+
 class Page:
-    def __init__(self, url: str, context: async_playwright):
+    # Seconds waited after each scroll for the next posts to load.
+    scroll_delay: Tuple[float, float] = (3, 5)
+
+    def __init__(self, url: str, page: PlaywrightPage):
         self.url = url
-        self.context = context
+        self.page = page
         self.post_urls = []
+        self.newest_post_id: Optional[str] = None
 
-    async def navigate_url(self, max_try: int=2) -> None:
-        self.page = await self.context.new_page()
+    async def goto(self) -> None:
+        with track_request("profile") as request:
+            response = await self.page.goto(self.url,
+                                            wait_until="networkidle")
+            if response:
+                request.status = response.status
+        if response:
+            check_status(self.url, response.status, response.headers)
 
-        for _ in range(max_try):
-            try:
-                await self.page.goto(self.url, wait_until="networkidle")
-                break
-
-            except Exception as navigate_error:
-                logger.error("Account Data Scraping Navigation Error -> "
-                             f"{self.url} {navigate_error}")
-                await asyncio.sleep(uniform(2, 3))
+    async def navigate_url(self) -> None:
+        await get_rate_controller().run(self.goto)
 
     async def get_current_ids(self, account_name: str) -> List[str]:
         content = await self.get_content()
-        parser = Parser(content)
-        current_ids = parser.get_post_ids(account_name)
-
-        await self.scroll()
+        current_ids = await run_parse(parse_post_ids, content, account_name)
         return current_ids
 
+    def update_newest_post(self, post_id: str) -> None:
+        unique_id = get_unique_id(post_id)
+        try:
+            if self.newest_post_id is None or \
+                    shortcode_to_media_id(unique_id) > \
+                    shortcode_to_media_id(self.newest_post_id):
+                self.newest_post_id = unique_id
+        except ValueError:
+            pass
+
     async def fetch_account_data(self, account_name: str,
-                            max_scrolls: int=100) -> Tuple[List[str], int]:
+                            max_scrolls: int=100,
+                            known_ids: Optional[Set[str]]=None)\
+            -> Tuple[List[str], int]:
+        """Scroll the profile and return its post urls and follower number.
+
+        With ``known_ids`` (unique ids already in the database) scrolling
+        stops at the first page that only shows known posts and only the
+        unknown posts are returned. A failed or throttled navigation is
+        raised, so an unloaded profile is never read as one without posts.
+        """
         await self.navigate_url()
         content = await self.get_content()
-        follower_number = Parser(content).get_follower_number()
+        follower_number = await run_parse(parse_follower_number, content)
 
         post_ids = set()
         for _ in range(max_scrolls):
-            new = False
+            new, unknown = False, False
             current_ids = await self.get_current_ids(account_name)
             for current_id in current_ids:
                 if current_id not in post_ids:
                     post_ids.add(current_id)
+                    self.update_newest_post(current_id)
                     new = True
+                    if known_ids is None or \
+                            get_unique_id(current_id) not in known_ids:
+                        unknown = True
 
             if not new:
                 break
+            if not unknown:
+                logger.info(f"Reached Already Known Posts Of {account_name}")
+                break
+
+            await self.scroll()
 
+        if known_ids:
+            post_ids = {post_id for post_id in post_ids
+                        if get_unique_id(post_id) not in known_ids}
         return ([f"https://www.instagram.com{post_id}" for post_id in post_ids], follower_number)
 
     async def scroll(self) -> None:
         await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(uniform(3, 5))
+        await asyncio.sleep(uniform(*self.scroll_delay))
 
     async def get_content(self) -> str:
         content = await self.page.content()
@@ -164,24 +211,33 @@ def get_urls_dict(account_data: List[Tuple[List, int]])\
     return urls_dict
 
 
+async def fetch_account(pool: BrowserPool, account_url: str,
+                        known_ids: Optional[Set[str]]=None)\
+        -> Tuple[List[str], int]:
+    account_name = account_url.strip("/").split("/")[-1]
+    try:
+        async with pool.page() as page:
+            return await Page(account_url, page).fetch_account_data(
+                account_name, known_ids=known_ids)
+
+    except Exception as account_error:
+        logger.error("Account Data Scraping Error -> "
+                     f"{account_url} {account_error}")
+        return [], 0
+
+
 async def get_accounts_data(accounts_urls: List[str])\
         -> Dict[Tuple[str, int], Dict[str, List]]:
-    logger.info(f"Scraping Accounts Post Urls...")
+    logger.info("Scraping Accounts Post Urls...")
+    pool = await get_browser_pool()
     account_data, accounts_length = [], len(accounts_urls)
-    for chunk_num in range(0, accounts_length, 10):
-        chunk_account_urls = accounts_urls[chunk_num:chunk_num + 10]
-
-        async with async_playwright() as pl:
-            chromium = Chromium(pl)
-            await chromium.initialize()
-
-            tasks = [Page(url, chromium.context).fetch_account_data
-                (url.strip("/").split("/")[-1]) for url in chunk_account_urls]
-            chunk_accounts_data = await asyncio.gather(*tasks)
-            account_data.extend(chunk_accounts_data)
+    for chunk_num in range(0, accounts_length, pool.size):
+        chunk_account_urls = accounts_urls[chunk_num:chunk_num + pool.size]
 
-            await chromium.close()
-            await asyncio.sleep(uniform(10, 15))
+        tasks = [fetch_account(pool, url) for url in chunk_account_urls]
+        chunk_accounts_data = await asyncio.gather(*tasks)
+        account_data.extend(chunk_accounts_data)
+        await asyncio.sleep(uniform(10, 15))
 
     urls_dict = get_urls_dict(account_data)
     return urls_dict
@@ -191,7 +247,14 @@ if __name__ == '__main__':
     accounts_urls = [
         "https://www.instagram.com/georgehotz/",
     ]
-    account_data = asyncio.run(get_accounts_data(accounts_urls))
+
+    async def main():
+        try:
+            return await get_accounts_data(accounts_urls)
+        finally:
+            await close_browser_pool()
+
+    account_data = asyncio.run(main())
     print(account_data)
     for url in account_data:
         print(f"{url} => {account_data[url]}")
\ No newline at end of file
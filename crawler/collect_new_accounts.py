@@ -1,51 +1,49 @@
-from typing import List
-import os
-import json
+from typing import List, Tuple
 import asyncio
 from random import uniform
 
-from playwright.async_api import async_playwright
+from playwright.async_api import Page as PlaywrightPage
 
+from crawler.rate_control import get_rate_controller, check_status
+from crawler.browser import get_browser_pool, close_browser_pool
 from utils.logger import get_logger
-from config.config import ROOT_DIR
+from utils.metrics import track_request, ACCOUNTS_DISCOVERED
 
 logger = get_logger("crawler_logger")
 
 
-def get_cookies(cookies_path: str=ROOT_DIR/"cookies/cookies.json"):
-    if not os.path.exists(cookies_path):
-        raise ModuleNotFoundError(
-            "Cookies Not Found. First Run save_account_cookies.py script!")
-
-    with open(cookies_path, "r") as json_file:
-        cookies = json.load(json_file)
-    return cookies
-
-
 class CollectFollowing:
-    def __init__(self, context: async_playwright, url: str):
-        self.context = context
+    # Seconds waited for the following dialog to open and after a scroll.
+    open_delay: Tuple[float, float] = (5, 7)
+    scroll_delay: Tuple[float, float] = (3, 5)
+
+    def __init__(self, page: PlaywrightPage, url: str):
+        self.page = page
         self.url = url
         self.following_accounts = []
 
-    async def navigate_url(self, max_try: int=2) -> None:
-        self.page = await self.context.new_page()
+    async def goto(self) -> None:
+        with track_request("following") as request:
+            response = await self.page.goto(self.url,
+                                            wait_until="networkidle")
+            if response:
+                request.status = response.status
+        if response:
+            check_status(self.url, response.status, response.headers)
 
-        for _ in range(max_try):
-            try:
-                await self.page.goto(self.url, wait_until="networkidle")
-                break
+    async def navigate_url(self) -> None:
+        try:
+            await get_rate_controller().run(self.goto)
 
-            except Exception as navigate_error:
-                logger.error(f"Account Crawling Navigation Error -> "
-                             f"{self.url} {navigate_error}")
-                await asyncio.sleep(uniform(2, 3))
+        except Exception as navigate_error:
+            logger.error(f"Account Crawling Navigation Error -> "
+                         f"{self.url} {navigate_error}")
 
     async def fetch_following_accounts(self,
             account_name: str, max_scrolls: int=100) -> List[str]:
         await self.navigate_url()
         await self.page.click(f'a[href="/{account_name}/following/"]')
-        await asyncio.sleep(uniform(5, 7))
+        await asyncio.sleep(uniform(*self.open_delay))
 
 
         profiles_length, profiles = 0, []
@@ -64,7 +62,7 @@ class CollectFollowing:
             for _ in range(2):
                 try:
                     await img_elements[-1].scroll_into_view_if_needed()
-                    await asyncio.sleep(uniform(3, 5))
+                    await asyncio.sleep(uniform(*self.scroll_delay))
 
                 except Exception as scroll_error:
                     logger.error("Error Occurred While Scrolling In "
@@ -72,41 +70,23 @@ class CollectFollowing:
 
         profiles = [f"https://www.instagram.com/{profile}" for
                     profile in profiles]
+        ACCOUNTS_DISCOVERED.inc(len(profiles))
         logger.info(f"Fetched {profiles_length} accounts from {account_name}")
         return profiles
 
 
-class Chromium:
-    def __init__(self, pl):
-        self.pl = pl
-
-    async def load_cookies(self):
-        cookies = get_cookies()
-        await self.context.add_cookies(cookies)
-
-    async def initialize(self):
-        self.browser = await self.pl.chromium.launch(headless=True)
-        self.context = await self.browser.new_context()
-        await self.load_cookies()
-
-    async def close(self):
-        await self.browser.close()
-
-
 async def get_following_accounts(account_url: str) -> List[str]:
     account_name = account_url.rstrip("/").split("/")[-1]
     logger.info(f"Collecting Following Account Urls From {account_url}")
     following_accounts = []
     try:
-        async with async_playwright() as pl:
-            chromium = Chromium(pl)
-            await chromium.initialize()
-
-            following_accounts = await CollectFollowing(chromium.context,
+        pool = await get_browser_pool()
+        async with pool.page() as page:
+            following_accounts = await CollectFollowing(page,
                         account_url).fetch_following_accounts(account_name)
-            await chromium.close()
-            if following_accounts:
-                await asyncio.sleep(uniform(10, 15))
+
+        if following_accounts:
+            await asyncio.sleep(uniform(10, 15))
 
         return following_accounts
 
@@ -117,8 +97,12 @@ async def get_following_accounts(account_url: str) -> List[str]:
 
 
 if __name__ == '__main__':
-    following_accounts = (
-        asyncio.run(get_following_accounts(
-            "https://www.instagram.com/cristiano/"
-        )))
+    async def main():
+        try:
+            return await get_following_accounts(
+                "https://www.instagram.com/cristiano/")
+        finally:
+            await close_browser_pool()
+
+    following_accounts = asyncio.run(main())
     print(following_accounts)
\ No newline at end of file
@@ -0,0 +1,159 @@
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict
+from urllib.parse import urlsplit, parse_qs
+from time import time
+import asyncio
+
+import aiohttp
+
+from crawler.meta_parser import HeadMetaParser, extract_og_meta
+from crawler.parse_executor import run_parse
+from crawler.http_client import get_http_session, drain_body
+from crawler.worker_pool import WorkerPool
+from crawler.rate_control import get_rate_controller, check_status
+from crawler.response_cache import get_response_cache
+from utils.logger import get_logger
+from utils.metrics import track_request
+from config.config import HTTP_CONCURRENCY, HTTP_ITEM_TIMEOUT
+
+logger = get_logger("crawler_logger")
+
+# Seconds a cached og:image URL must stay valid for, to still be downloaded.
+SIGNED_URL_MARGIN = 600
+
+
+def parse_caption(og_description: Optional[str]) -> str:
+    if not og_description or ":" not in og_description:
+        return ""
+    col = og_description.index(":") + 2
+
+    caption = og_description[col:].rstrip(" ").rstrip(".")
+    return caption.strip('"')
+
+
+def is_image_url(post_url: str) -> bool:
+    return post_url.rstrip("/").split("/")[-2] == "p"
+
+
+@dataclass
+class PostMeta:
+    post_url: str
+    og: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def caption(self) -> str:
+        return parse_caption(self.og.get("og:description"))
+
+    @property
+    def image_url(self) -> Optional[str]:
+        return self.og.get("og:image")
+
+    @property
+    def content_type(self) -> bool:
+        if "og:video" in self.og or \
+                self.og.get("og:type", "").startswith("video"):
+            return False
+        return is_image_url(self.post_url)
+
+
+async def read_og_meta(response: aiohttp.ClientResponse,
+                       chunk_size: int=16384) -> Dict[str, str]:
+    parser = HeadMetaParser("og:", response.charset or "utf-8")
+    async for chunk in response.content.iter_chunked(chunk_size):
+        if parser.feed(chunk):
+            break
+    await drain_body(response)
+    return await run_parse(extract_og_meta, parser.finish())
+
+
+async def fetch_og_meta(session: aiohttp.ClientSession, post_url: str,
+                        stage: str="post_meta") -> Dict[str, str]:
+    with track_request(stage) as request:
+        async with session.get(post_url, timeout=5) as response:
+            request.status = response.status
+            check_status(post_url, response.status, response.headers)
+            og = await read_og_meta(response)
+    if not og:
+        raise ValueError(f"No og: Meta Tags In {post_url}")
+    return og
+
+
+def get_url_expiry(url: Optional[str]) -> Optional[float]:
+    """Unix time a signed CDN URL expires, from its hex ``oe`` parameter."""
+    if not url:
+        return None
+    oe = parse_qs(urlsplit(url).query).get("oe")
+    try:
+        return float(int(oe[0], 16)) if oe else None
+    except ValueError:
+        return None
+
+
+def is_usable(og: Dict[str, str]) -> bool:
+    expiry = get_url_expiry(og.get("og:image"))
+    return expiry is None or expiry - time() > SIGNED_URL_MARGIN
+
+
+def get_cache_key(post_url: str) -> str:
+    return f"og:{post_url}"
+
+
+async def get_post_meta(session: aiohttp.ClientSession, post_url: str,
+                        check_cache: bool=True) -> PostMeta:
+    cache = get_response_cache()
+    try:
+        if cache is not None and check_cache:
+            og = await cache.get(get_cache_key(post_url))
+            if og and is_usable(og):
+                return PostMeta(post_url, og)
+
+        og = await get_rate_controller().run(
+            lambda: fetch_og_meta(session, post_url))
+        if cache is not None:
+            await cache.set(get_cache_key(post_url), og)
+        return PostMeta(post_url, og)
+
+    except Exception as e:
+        logger.error(f"Post Meta Request Error Occurred In "
+                     f"{post_url} -> {e}")
+
+    return PostMeta(post_url)
+
+
+async def get_posts_meta(post_urls: List[str],
+                         concurrency: int=HTTP_CONCURRENCY)\
+        -> Dict[str, PostMeta]:
+    posts_meta: Dict[str, PostMeta] = {}
+    cache = get_response_cache()
+    if cache is not None:
+        # Cached posts never reach the pool, so they take no request slot.
+        cached = await cache.get_many([get_cache_key(post_url)
+                                       for post_url in post_urls])
+        for post_url in post_urls:
+            og = cached.get(get_cache_key(post_url))
+            if og and is_usable(og):
+                posts_meta[post_url] = PostMeta(post_url, og)
+        post_urls = [post_url for post_url in post_urls
+                     if post_url not in posts_meta]
+
+    pool = WorkerPool(concurrency, HTTP_ITEM_TIMEOUT, name="Post Meta")
+    session = get_http_session()
+    results = await pool.map(
+        lambda post_url: get_post_meta(session, post_url, check_cache=False),
+        post_urls, default=PostMeta)
+
+    posts_meta.update((post_meta.post_url, post_meta)
+                      for post_meta in results)
+    logger.info(f"{len(posts_meta)} Post Meta Records Fetched!")
+    return posts_meta
+
+
+if __name__ == "__main__":
+    post_urls = [
+        "https://www.instagram.com/georgehotz/reel/DCrPAcmTRTU/",
+        "https://www.instagram.com/georgehotz/p/C77Wl-OA_ue/",
+    ]
+
+    posts_meta = asyncio.run(get_posts_meta(post_urls))
+    for url in posts_meta:
+        print(f"{url} => {posts_meta[url]}")
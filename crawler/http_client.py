@@ -0,0 +1,207 @@
+from collections import deque
+from http.cookies import SimpleCookie
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Deque, Dict, Optional
+import json
+import os
+
+import aiohttp
+
+from utils.logger import get_logger
+from config.config import (ROOT_DIR, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST,
+                           HTTP_KEEPALIVE_SECONDS, HTTP_DNS_CACHE_SECONDS,
+                           HTTP_COOKIES, HTTP_DRAIN_BYTES)
+
+logger = get_logger("crawler_logger")
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+LATENCY_SAMPLES = 10000
+
+
+def load_cookie_jar(cookies_path: str=ROOT_DIR/"cookies/cookies.json")\
+        -> aiohttp.CookieJar:
+    """Cookie jar filled from the Playwright cookies saved by
+    ``save_account_cookies.py``, empty if there aren't any."""
+    cookie_jar = aiohttp.CookieJar()
+    if not os.path.exists(cookies_path):
+        logger.warning(f"No Cookies To Load In {cookies_path}")
+        return cookie_jar
+
+    with open(cookies_path, "r", encoding="utf-8") as cookies_file:
+        cookies_data = json.load(cookies_file)
+
+    cookies = SimpleCookie()
+    for cookie in cookies_data:
+        if not isinstance(cookie, dict) or "name" not in cookie:
+            continue
+        cookies[cookie["name"]] = cookie.get("value", "")
+        morsel = cookies[cookie["name"]]
+        morsel["domain"] = cookie.get("domain", ".instagram.com")
+        morsel["path"] = cookie.get("path", "/")
+        if cookie.get("secure"):
+            morsel["secure"] = True
+    cookie_jar.update_cookies(cookies)
+    logger.info(f"{len(cookies)} Cookies Loaded Into The HTTP Client")
+    return cookie_jar
+
+
+async def drain_body(response: aiohttp.ClientResponse,
+                     limit: int=HTTP_DRAIN_BYTES) -> bool:
+    """Read and discard the rest of the body.
+
+    A response released with unread body can't go back to the pool, aiohttp
+    closes its connection. Draining keeps it alive, unless more than
+    ``limit`` bytes are left, which cost more than a new connection.
+    """
+    drained = 0
+    while not response.content.at_eof():
+        chunk = await response.content.readany()
+        if not chunk:
+            break
+        drained += len(chunk)
+        if drained > limit:
+            return False
+    return True
+
+
+class ConnectionStats:
+    def __init__(self):
+        self.requests = 0
+        self.created = 0
+        self.reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        # Seconds to the response headers of the last LATENCY_SAMPLES
+        # requests.
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def get_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context: SimpleNamespace,
+                                   params) -> None:
+            context.start_time = perf_counter()
+
+        async def on_request_end(session, context: SimpleNamespace,
+                                 params) -> None:
+            self.requests += 1
+            self.latencies.append(perf_counter() - context.start_time)
+
+        async def on_connection_create_end(session, context: SimpleNamespace,
+                                           params) -> None:
+            self.created += 1
+
+        async def on_connection_reuseconn(session, context: SimpleNamespace,
+                                          params) -> None:
+            self.reused += 1
+
+        async def on_dns_cache_hit(session, context: SimpleNamespace,
+                                   params) -> None:
+            self.dns_hits += 1
+
+        async def on_dns_cache_miss(session, context: SimpleNamespace,
+                                    params) -> None:
+            self.dns_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def as_dict(self) -> Dict[str, float]:
+        connections = self.created + self.reused
+        return {
+            "requests": self.requests,
+            "connections_created": self.created,
+            "connections_reused": self.reused,
+            "reuse_rate": round(self.reused / connections, 4)
+                if connections else 0.0,
+            "dns_cache_hits": self.dns_hits,
+            "dns_cache_misses": self.dns_misses,
+        }
+
+
+class HttpClient:
+    """One ``aiohttp.ClientSession`` shared by every plain HTTP stage.
+
+    Post metadata, pre-scoring and image downloads all go to the same few
+    Instagram and CDN hosts, so a single connector keeps their connections
+    alive between stages and accounts instead of paying a TCP/TLS handshake
+    and a DNS lookup per session. ``stats`` counts new and reused
+    connections through an ``aiohttp.TraceConfig``.
+    """
+
+    def __init__(self, limit: int=HTTP_POOL_LIMIT,
+                 limit_per_host: int=HTTP_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout: float=HTTP_KEEPALIVE_SECONDS,
+                 dns_cache_seconds: int=HTTP_DNS_CACHE_SECONDS,
+                 use_cookies: bool=HTTP_COOKIES):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_seconds = dns_cache_seconds
+        self.use_cookies = use_cookies
+        self.stats = ConnectionStats()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_seconds or None,
+                use_dns_cache=self.dns_cache_seconds > 0,
+                enable_cleanup_closed=True)
+            cookie_jar = load_cookie_jar() if self.use_cookies \
+                else aiohttp.DummyCookieJar()
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=cookie_jar,
+                headers=DEFAULT_HEADERS,
+                auto_decompress=True,
+                trace_configs=[self.stats.get_trace_config()])
+        return self.session
+
+    def log_stats(self) -> None:
+        stats = self.stats.as_dict()
+        logger.info(f"HTTP Client -> {stats['requests']} Requests, "
+                    f"{stats['connections_created']} Connections Created, "
+                    f"{stats['connections_reused']} Reused "
+                    f"({stats['reuse_rate']:.0%}), "
+                    f"{stats['dns_cache_hits']} DNS Cache Hits")
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+http_client: Optional[HttpClient] = None
+
+
+def get_http_client() -> HttpClient:
+    global http_client
+    if http_client is None:
+        http_client = HttpClient()
+    return http_client
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    return get_http_client().get_session()
+
+
+async def close_http_client() -> None:
+    global http_client
+    if http_client is not None:
+        http_client.log_stats()
+        await http_client.close()
+        http_client = None
@@ -1,14 +1,20 @@
 from typing import List, Optional, Dict, Union
-from random import uniform
 from abc import ABC, abstractmethod
 import asyncio
-import os
 
-from bs4 import BeautifulSoup
 import aiohttp
 
+from crawler.collect_account_data import get_unique_id
+from crawler.collect_post_meta import PostMeta, get_post_meta
+from crawler.media_store import MediaFile, get_media_store, remove_file
+from crawler.http_client import get_http_session
+from crawler.worker_pool import WorkerPool
+from crawler.rate_control import get_rate_controller, check_status
 from utils.logger import get_logger
-from config.config import ROOT_DIR
+from utils.metrics import track_request, DOWNLOADED_BYTES
+from db.media import MediaDB
+from config.config import (HTTP_CONCURRENCY, HTTP_ITEM_TIMEOUT,
+                           VIDEO_CONCURRENCY, VIDEO_ITEM_TIMEOUT)
 
 logger = get_logger("crawler_logger")
 
@@ -27,11 +33,32 @@ class MediaDownload(ABC):
         self.urls = urls
         self.account_name = self.urls[0].rstrip("/").split \
         ("/")[-3] if self.urls else ""
-
-    def check_directory(self, img_directory: str) -> None:
-        if not os.path.exists(img_directory):
-            os.makedirs(img_directory)
-        return None
+        self.media_store = get_media_store()
+        self.media_files: Dict[str, MediaFile] = {}
+
+    async def get_stored_paths(self, post_urls: List[str]) -> Dict[str, str]:
+        """Paths of posts downloaded before whose file is still intact in
+        the store, e.g. by an attempt whose post write didn't land."""
+        unique_ids = {get_unique_id(post_url): post_url
+                      for post_url in post_urls}
+        post_files = await MediaDB().get_post_files(list(unique_ids))
+        if not post_files:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        present = await loop.run_in_executor(None, lambda: [
+            (unique_id, path) for unique_id, (digest, path, size)
+            in post_files.items()
+            if self.media_store.is_verified(path, digest, size)])
+        return {unique_ids[unique_id]: path for unique_id, path in present}
+
+    async def record_media_files(self) -> None:
+        await MediaDB().record(
+            [media_file.as_row() for media_file in self.media_files.values()],
+            [(get_unique_id(post_url), media_file.sha256)
+             for post_url, media_file in self.media_files.items()])
+        logger.info(f"Media Store Totals -> {self.media_store.stored} Stored, "
+                    f"{self.media_store.duplicates} Duplicates")
 
     @abstractmethod
     def download(self):
@@ -39,64 +66,67 @@ class MediaDownload(ABC):
 
 
 class ImageDownload(MediaDownload):
-    def __init__(self, urls: List[str]):
+    def __init__(self, urls: List[str],
+                 posts_meta: Optional[Dict[str, PostMeta]]=None):
         super().__init__(urls)
+        self.posts_meta = posts_meta or {}
 
     async def get_image_url(self, session: aiohttp.ClientSession,
                             post_url: str) -> Optional[str]:
-        for _ in range(2):
-            try:
-                async with session.get(post_url, timeout=5) as response:
-                    html_code = await response.text()
-                    soup = BeautifulSoup(html_code, "html.parser")
-                    meta_tag = soup.find('meta', property='og:image')
-                    if meta_tag:
-                        return meta_tag["content"]
-
-            except Exception as e:
-                logger.error(f"Image Request Error Occurred In {post_url} -> {e}")
-
-        return None
+        post_meta = self.posts_meta.get(post_url)
+        if post_meta is None:
+            post_meta = await get_post_meta(session, post_url)
+        return post_meta.image_url
+
+    async def fetch_image(self, session: aiohttp.ClientSession,
+                          image_url: str) -> MediaFile:
+        with track_request("image") as request:
+            async with session.get(image_url) as img_response:
+                request.status = img_response.status
+                check_status(image_url, img_response.status,
+                             img_response.headers)
+                img_response.raise_for_status()
+                media_file = await self.media_store.save_response(
+                    img_response, ".jpg")
+        DOWNLOADED_BYTES.inc(media_file.size, stage="image")
+        return media_file
 
     async def download_image_content(self, session: aiohttp.ClientSession,
                                      post_url: str) -> List[str]:
         try:
-            unique_id = post_url.rstrip("/").split("/")[-1]
             image_url = await self.get_image_url(session, post_url)
             if not image_url:
                 return [post_url, ""]
 
-            img_directory = f"{ROOT_DIR}/data/{self.account_name}"
-            self.check_directory(img_directory)
-            img_path = f"{img_directory}/{unique_id}.jpg"
-
-            async with session.get(image_url) as img_response:
-                image_data = await img_response.read()
-                with open(img_path, "wb") as file:
-                    file.write(image_data)
+            media_file = await get_rate_controller("cdn").run(
+                lambda: self.fetch_image(session, image_url))
+            self.media_files[post_url] = media_file
 
-            return [post_url, f"data/{self.account_name}/{unique_id}.jpg"]
+            return [post_url, media_file.path]
         except Exception as image_error:
             logger.error(f"Error Occurred While Downloading "
                          f"Image -> {image_error}")
             return [post_url, ""]
 
-    async def download(self, batch_size: int=60) -> Dict[str, str]:
-        urls_length = len(self.urls)
-        image_paths = {}
-        async with aiohttp.ClientSession() as session:
-            for i in range(0, urls_length, batch_size):
-                curr_post_urls = self.urls[i:i + batch_size]
-                tasks = [self.download_image_content(session, post_url)
-                         for post_url in curr_post_urls]
-                curr_image_paths = [c for c in await asyncio.gather(*tasks)]
-                for curr in curr_image_paths:
-                    image_paths[curr[0]] = curr[1]
-
-                logger.info(f"Downloaded {i // batch_size + 1}. Image Batch!")
-                await asyncio.sleep(uniform(3, 5))
-
-        return image_paths
+    async def download(self, concurrency: int=HTTP_CONCURRENCY)\
+            -> Dict[str, str]:
+        pool = WorkerPool(concurrency, HTTP_ITEM_TIMEOUT,
+                          name="Image Download")
+        stored_paths = await self.get_stored_paths(self.urls)
+        if stored_paths:
+            logger.info(f"Skipping {len(stored_paths)} Already "
+                        f"Downloaded Images")
+        session = get_http_session()
+        image_paths = await pool.map(
+            lambda post_url: self.download_image_content(session, post_url),
+            [post_url for post_url in self.urls
+             if post_url not in stored_paths],
+            default=lambda post_url: [post_url, ""])
+
+        await self.record_media_files()
+        logger.info(f"Downloaded {len(image_paths)} Images!")
+        stored_paths.update((curr[0], curr[1]) for curr in image_paths)
+        return stored_paths
 
 
 class VideoDownload(MediaDownload):
@@ -105,11 +135,10 @@ class VideoDownload(MediaDownload):
 
     async def download_video_content(self, post_url: str) -> List[str]:
         try:
-            unique_id = post_url.rstrip("/").split("/")[-1]
-            video_directory = f"{ROOT_DIR}/data/{self.account_name}"
-            self.check_directory(video_directory)
-
-            video_path = os.path.join(video_directory, f"{unique_id}.mp4")
+            loop = asyncio.get_running_loop()
+            temp_path = await loop.run_in_executor(
+                None, self.media_store.get_temp_path)
+            video_path = f"{temp_path}.mp4"
             ytdlp_command = [
                 "yt-dlp",
                 "-f", "best",
@@ -117,16 +146,25 @@ class VideoDownload(MediaDownload):
                 post_url
             ]
 
-            process = await asyncio.create_subprocess_exec(
-                *ytdlp_command,
-                stdout=asyncio.subprocess.DEVNULL,
-                stderr=asyncio.subprocess.DEVNULL
-            )
+            with track_request("video") as request:
+                process = await asyncio.create_subprocess_exec(
+                    *ytdlp_command,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+
+                await process.communicate()
+                request.status = "ok" if process.returncode == 0 \
+                    else "error"
 
-            await process.communicate()
             if process.returncode == 0:
-                return [post_url, f"data/{self.account_name}/{unique_id}.mp4"]
+                media_file = await self.media_store.save_file(video_path,
+                                                              ".mp4")
+                self.media_files[post_url] = media_file
+                DOWNLOADED_BYTES.inc(media_file.size, stage="video")
+                return [post_url, media_file.path]
             else:
+                await loop.run_in_executor(None, remove_file, video_path)
                 raise Exception(f"Download failed for {post_url}")
 
         except Exception as video_error:
@@ -135,22 +173,23 @@ class VideoDownload(MediaDownload):
             return [post_url, ""]
 
 
-    async def download(self, batch_size: int=40) -> Dict[str, str]:
-        video_paths = {}
-        videos_length = len(self.urls)
-        for i in range(0, videos_length, batch_size):
-            curr_video_urls = self.urls[i:i + batch_size]
-            tasks = [self.download_video_content(url)
-                     for url in curr_video_urls]
-
-            curr_video_paths = [v for v in await asyncio.gather(*tasks)]
-            for curr in curr_video_paths:
-                video_paths[curr[0]] = curr[1]
-
-            logger.info(f"Downloaded {i // batch_size + 1}. Video Batch!")
-            await asyncio.sleep(uniform(3, 15))
-
-        return video_paths
+    async def download(self, concurrency: int=VIDEO_CONCURRENCY)\
+            -> Dict[str, str]:
+        pool = WorkerPool(concurrency, VIDEO_ITEM_TIMEOUT,
+                          name="Video Download")
+        stored_paths = await self.get_stored_paths(self.urls)
+        if stored_paths:
+            logger.info(f"Skipping {len(stored_paths)} Already "
+                        f"Downloaded Videos")
+        video_paths = await pool.map(self.download_video_content,
+                                     [post_url for post_url in self.urls
+                                      if post_url not in stored_paths],
+                                     default=lambda post_url: [post_url, ""])
+
+        await self.record_media_files()
+        logger.info(f"Downloaded {len(video_paths)} Videos!")
+        stored_paths.update((curr[0], curr[1]) for curr in video_paths)
+        return stored_paths
 
 
 if __name__ == '__main__':
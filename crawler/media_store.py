@@ -0,0 +1,216 @@
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Set, Tuple
+from hashlib import sha256
+from uuid import uuid4
+import asyncio
+import os
+
+import aiohttp
+
+from db.media import MediaDB
+from utils.logger import get_logger
+from config.config import ROOT_DIR, MEDIA_STORE_DIR
+
+logger = get_logger("crawler_logger")
+
+
+def remove_file(file_path: str) -> None:
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def hash_file(file_path: str, chunk_size: int=1 << 20) -> str:
+    hasher = sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def write_chunk(file: BinaryIO, chunk: bytes, hasher) -> None:
+    file.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+async def stream_to_file(response: aiohttp.ClientResponse, file_path: str,
+                         chunk_size: int=65536, hasher=None) -> int:
+    """Stream the body to ``file_path``, feeding ``hasher`` on the way."""
+    loop = asyncio.get_running_loop()
+    temp_path = f"{file_path}.part"
+    written = 0
+
+    try:
+        file = await loop.run_in_executor(None, open, temp_path, "wb")
+        try:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                await loop.run_in_executor(None, write_chunk, file, chunk,
+                                           hasher)
+                written += len(chunk)
+        finally:
+            await loop.run_in_executor(None, file.close)
+
+        expected = response.content_length
+        if "Content-Encoding" in response.headers:
+            expected = None
+        if not written or (expected is not None and written != expected):
+            raise ValueError(f"Incomplete Download Of {file_path} -> "
+                             f"{written}/{expected} Bytes")
+
+        await loop.run_in_executor(None, os.replace, temp_path, file_path)
+        return written
+
+    except BaseException:
+        await loop.run_in_executor(None, remove_file, temp_path)
+        raise
+
+
+@dataclass(frozen=True)
+class MediaFile:
+    sha256: str
+    path: str
+    size: int
+
+    def as_row(self) -> Tuple[str, str, int]:
+        return self.sha256, self.path, self.size
+
+
+class MediaStore:
+    """Content-addressed media files.
+
+    A file is stored once under ``<store>/<ab>/<cd>/<sha256><ext>``, where
+    ``ab`` and ``cd`` are the first hash bytes, so no directory grows past
+    a few thousand entries. Reposted media hashes to the same path and all
+    of its posts reference that one file. Paths are relative to
+    ``ROOT_DIR``, like ``download_path`` in ``posts``.
+    """
+
+    def __init__(self, store_dir: str=MEDIA_STORE_DIR):
+        self.store_dir = store_dir.rstrip("/")
+        self.stored = 0
+        self.duplicates = 0
+        # Digests whose file this process wrote or hashed, so a file is
+        # re-hashed once per run rather than on every duplicate.
+        self.verified: Set[str] = set()
+
+    def get_path(self, digest: str, extension: str) -> str:
+        return f"{self.store_dir}/{digest[:2]}/{digest[2:4]}/" \
+               f"{digest}{extension}"
+
+    def get_full_path(self, path: str) -> str:
+        return os.path.join(ROOT_DIR, path)
+
+    def get_temp_path(self) -> str:
+        temp_directory = self.get_full_path(f"{self.store_dir}/tmp")
+        os.makedirs(temp_directory, exist_ok=True)
+        return os.path.join(temp_directory, uuid4().hex)
+
+    def commit(self, temp_path: str, digest: str, extension: str,
+               size: int) -> MediaFile:
+        path = self.get_path(digest, extension)
+        full_path = self.get_full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        # An existing file is only reused if it still has the right content,
+        # otherwise the fresh download repairs it.
+        if self.is_verified(path, digest, size):
+            remove_file(temp_path)
+            self.duplicates += 1
+        else:
+            os.replace(temp_path, full_path)
+            self.verified.add(digest)
+            self.stored += 1
+        return MediaFile(digest, path, size)
+
+    async def save_response(self, response: aiohttp.ClientResponse,
+                            extension: str) -> MediaFile:
+        loop = asyncio.get_running_loop()
+        temp_path = await loop.run_in_executor(None, self.get_temp_path)
+        hasher = sha256()
+        try:
+            size = await stream_to_file(response, temp_path, hasher=hasher)
+            return await loop.run_in_executor(None, self.commit, temp_path,
+                                              hasher.hexdigest(), extension,
+                                              size)
+        except BaseException:
+            await loop.run_in_executor(None, remove_file, temp_path)
+            raise
+
+    async def save_file(self, file_path: str, extension: str) -> MediaFile:
+        """Move a finished file (e.g. a yt-dlp download) into the store."""
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(None, hash_file, file_path)
+        size = await loop.run_in_executor(None, os.path.getsize, file_path)
+        return await loop.run_in_executor(None, self.commit, file_path,
+                                          digest, extension, size)
+
+    def is_present(self, path: str, size: int) -> bool:
+        full_path = self.get_full_path(path)
+        return os.path.isfile(full_path) and \
+            os.path.getsize(full_path) == size
+
+    def is_verified(self, path: str, digest: str, size: int) -> bool:
+        """Whether ``path`` holds ``size`` bytes hashing to ``digest``. The
+        size is checked every time, the hash once per process."""
+        if not self.is_present(path, size):
+            self.verified.discard(digest)
+            return False
+        if digest not in self.verified:
+            if hash_file(self.get_full_path(path)) != digest:
+                return False
+            self.verified.add(digest)
+        return True
+
+    def is_intact(self, media_file: MediaFile) -> bool:
+        return self.is_present(media_file.path, media_file.size) and \
+            hash_file(self.get_full_path(media_file.path)) == \
+            media_file.sha256
+
+    async def verify(self) -> Tuple[int, int]:
+        """Re-hash every indexed file and drop the missing or corrupt ones.
+
+        Returns the number of intact and dropped files.
+        """
+        loop = asyncio.get_running_loop()
+        media_db = MediaDB()
+        intact_number, dropped = 0, []
+        async for rows in media_db.iter_file_batches():
+            intact = []
+            for row in rows:
+                media_file = MediaFile(*row)
+                if await loop.run_in_executor(None, self.is_intact,
+                                              media_file):
+                    intact.append(media_file.sha256)
+                else:
+                    logger.warning(f"Media File Is Missing Or Corrupt -> "
+                                   f"{media_file.path}")
+                    dropped.append(media_file)
+
+            if intact:
+                await media_db.mark_verified(intact)
+            intact_number += len(intact)
+
+        for media_file in dropped:
+            await loop.run_in_executor(
+                None, remove_file, self.get_full_path(media_file.path))
+        if dropped:
+            await media_db.delete([media_file.as_row()
+                                   for media_file in dropped])
+
+        logger.info(f"Verified Media Store -> {intact_number} Intact, "
+                    f"{len(dropped)} Dropped")
+        return intact_number, len(dropped)
+
+
+media_store: Optional[MediaStore] = None
+
+
+def get_media_store() -> MediaStore:
+    global media_store
+    if media_store is None:
+        media_store = MediaStore()
+    return media_store
+
+
+if __name__ == '__main__':
+    print(asyncio.run(get_media_store().verify()))
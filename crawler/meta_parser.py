@@ -0,0 +1,123 @@
+from typing import Dict, List, Match, Optional, Tuple, Union
+from html import unescape
+import codecs
+import re
+
+# Attribute text up to the closing ">", which may itself appear inside
+# quoted values such as a caption in og:description.
+ATTRIBUTES = r"""(?:"[^"]*"|'[^']*'|[^'">])*"""
+ATTRIBUTE_RE = re.compile(
+    r"""([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+# Comments and raw text elements are skipped as a whole, so "<body" or
+# "</head>" inside an inline script doesn't end the head.
+HEAD_TOKEN_RE = re.compile(
+    rf"<!--|<(script|style|title|textarea)\b{ATTRIBUTES}>"
+    rf"|<meta\b({ATTRIBUTES})>|</head\s*>|<body\b", re.IGNORECASE)
+RAW_TEXT_END_RES = {
+    name: re.compile(rf"</{name}\s*>", re.IGNORECASE)
+    for name in ("script", "style", "title", "textarea")
+}
+
+
+def scan_head(html_code: str, pos: int=0)\
+        -> Tuple[List[Match], Optional[int], int]:
+    """Scan the head from ``pos`` for ``<meta>`` tags.
+
+    Returns the meta tag matches, the position where the head ends (None
+    if the text ends first) and the position a scan of more text should
+    resume from, which is before any comment or element left unterminated.
+    """
+    meta_tags = []
+    while True:
+        token = HEAD_TOKEN_RE.search(html_code, pos)
+        if token is None:
+            resume_pos = html_code.rfind("<", pos)
+            return meta_tags, None, resume_pos if resume_pos >= 0 \
+                else len(html_code)
+
+        if token.group(0) == "<!--":
+            end = html_code.find("-->", token.end())
+            if end < 0:
+                return meta_tags, None, token.start()
+            pos = end + 3
+        elif token.group(1):
+            end = RAW_TEXT_END_RES[token.group(1).lower()].search(
+                html_code, token.end())
+            if end is None:
+                return meta_tags, None, token.start()
+            pos = end.end()
+        elif token.group(2) is not None:
+            meta_tags.append(token)
+            pos = token.end()
+        else:
+            return meta_tags, token.start(), token.start()
+
+
+def parse_meta_attributes(attributes_text: str) -> Dict[str, str]:
+    attributes = {}
+    for match in ATTRIBUTE_RE.finditer(attributes_text):
+        name = match.group(1).lower()
+        value = next(v for v in match.groups()[1:] if v is not None)
+        attributes.setdefault(name, unescape(value))
+    return attributes
+
+
+def extract_meta(html_code: str, prefix: str="og:") -> Dict[str, str]:
+    """Return ``property -> content`` for the ``<meta>`` tags in the head.
+
+    Only the text before ``</head>`` (or the opening ``<body>``) is scanned,
+    so callers can pass a truncated page. The first tag wins for repeated
+    properties, like ``soup.find`` does.
+    """
+    meta_tags, _, _ = scan_head(html_code)
+
+    meta = {}
+    for tag in meta_tags:
+        attributes = parse_meta_attributes(tag.group(2))
+        prop = attributes.get("property") or attributes.get("name")
+        if prop and prop.startswith(prefix) and "content" in attributes:
+            meta.setdefault(prop, attributes["content"])
+    return meta
+
+
+def extract_og_meta(html_code: str) -> Dict[str, str]:
+    return extract_meta(html_code, "og:")
+
+
+class HeadMetaParser:
+    """Incremental variant of ``extract_meta`` for streamed bodies.
+
+    ``feed`` returns True once the end of the head was seen, after which the
+    rest of the response doesn't need to be read.
+    """
+
+    def __init__(self, prefix: str="og:", encoding: str="utf-8"):
+        self.prefix = prefix
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.buffer = ""
+        self.scan_pos = 0
+        self.done = False
+
+    def feed(self, chunk: Union[bytes, str]) -> bool:
+        if self.done:
+            return True
+
+        if isinstance(chunk, bytes):
+            chunk = self.decoder.decode(chunk)
+
+        self.buffer += chunk
+        _, head_end, self.scan_pos = scan_head(self.buffer, self.scan_pos)
+        self.done = head_end is not None
+        return self.done
+
+    def finish(self) -> str:
+        if not self.done:
+            self.buffer += self.decoder.decode(b"", final=True)
+        return self.buffer
+
+    def close(self) -> Dict[str, str]:
+        return extract_meta(self.finish(), self.prefix)
+
+
+def get_meta_content(html_code: str, prop: str) -> Optional[str]:
+    return extract_meta(html_code, prop).get(prop)
@@ -0,0 +1,111 @@
+from typing import Callable, Dict, Optional, Tuple, Any
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from time import perf_counter
+import asyncio
+
+from utils.logger import get_logger
+from config.config import PARSE_EXECUTOR, PARSE_WORKERS
+
+logger = get_logger("crawler_logger")
+
+
+def timed_call(func: Callable, *args) -> Tuple[Any, float]:
+    start_time = perf_counter()
+    result = func(*args)
+    return result, perf_counter() - start_time
+
+
+class ParseStats:
+    def __init__(self):
+        self.count = 0
+        self.parse_time = 0.0
+        self.max_parse_time = 0.0
+        self.wait_time = 0.0
+
+    def add(self, parse_time: float, wait_time: float) -> None:
+        self.count += 1
+        self.parse_time += parse_time
+        self.max_parse_time = max(self.max_parse_time, parse_time)
+        self.wait_time += wait_time
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "parse_seconds": round(self.parse_time, 4),
+            "avg_parse_ms": round(self.parse_time / self.count * 1000, 3)
+                if self.count else 0.0,
+            "max_parse_ms": round(self.max_parse_time * 1000, 3),
+            "wait_seconds": round(self.wait_time, 4),
+        }
+
+
+class ParseExecutor:
+    """Runs CPU-bound HTML parsing off the event loop.
+
+    ``kind`` is ``thread``, ``process`` or ``inline`` (parse on the loop,
+    useful as a baseline). Parse functions must be module level so they can
+    be pickled for the process pool. ``parse_seconds`` in the stats is the
+    time the parse would have blocked the event loop, ``wait_seconds`` the
+    time the caller actually waited including queueing in the pool.
+    """
+
+    def __init__(self, kind: str=PARSE_EXECUTOR, workers: int=PARSE_WORKERS):
+        self.kind = kind
+        self.workers = workers
+        self.executor: Optional[Executor] = None
+        if kind == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        elif kind == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=workers,
+                                               thread_name_prefix="parse")
+        elif kind != "inline":
+            raise ValueError(f"Unknown Parse Executor Kind -> {kind}")
+
+        self.stats: Dict[str, ParseStats] = {}
+
+    async def run(self, func: Callable, *args) -> Any:
+        start_time = perf_counter()
+        if self.executor is None:
+            result, parse_time = timed_call(func, *args)
+        else:
+            loop = asyncio.get_running_loop()
+            result, parse_time = await loop.run_in_executor(
+                self.executor, timed_call, func, *args)
+
+        wait_time = perf_counter() - start_time
+        self.stats.setdefault(func.__name__, ParseStats()).add(
+            parse_time, wait_time)
+        return result
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def log_stats(self) -> None:
+        for name, stats in self.get_stats().items():
+            logger.info(f"Parse Stats ({self.kind}) {name} -> {stats}")
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+parse_executor: Optional[ParseExecutor] = None
+
+
+def get_parse_executor() -> ParseExecutor:
+    global parse_executor
+    if parse_executor is None:
+        parse_executor = ParseExecutor()
+    return parse_executor
+
+
+async def run_parse(func: Callable, *args) -> Any:
+    return await get_parse_executor().run(func, *args)
+
+
+def close_parse_executor() -> None:
+    global parse_executor
+    if parse_executor is not None:
+        parse_executor.close()
+        parse_executor = None
@@ -0,0 +1,248 @@
+from typing import (List, Dict, Set, Tuple, Union, Optional, Callable,
+                    Awaitable)
+import asyncio
+
+from crawler.browser import BrowserPool, get_browser_pool
+from crawler.collect_account_data import Page, get_urls_dict, get_unique_id
+from crawler.collect_post_meta import PostMeta, get_posts_meta
+from crawler.collect_post_descriptions import get_descriptions, update_data_descriptions
+from crawler.install_content import ImageDownload, update_data_paths
+from crawler.seen_set import get_seen_set
+from db.write_data import WriteDB
+from db.read_posts import PostsDB
+from utils.logger import get_logger
+from utils.metrics import QUEUE_DEPTH, record_written
+from config.config import (PIPELINE_QUEUE_SIZE, INCREMENTAL_CRAWL,
+                           WRITE_BATCH_SIZE)
+
+logger = get_logger("crawler_logger")
+
+AccountKey = Tuple[str, int]
+
+
+def get_split_posts(curr_post_data: Dict[str, List[Union[bool, str]]]) -> (
+        Tuple)[List[str], List[str]]:
+    image_posts, video_posts = [], []
+    for c in curr_post_data:
+        if curr_post_data[c][0]:
+            image_posts.append(c)
+        else:
+            video_posts.append(c)
+
+    return image_posts, video_posts
+
+
+def update_data_types(curr_post_data: Dict[str, List[Union[bool, str]]],
+                      posts_meta: Dict[str, PostMeta]) -> None:
+    for post_url in posts_meta:
+        if post_url in curr_post_data and posts_meta[post_url].og:
+            curr_post_data[post_url][0] = posts_meta[post_url].content_type
+
+
+def update_data(curr_posts_data, descriptions_data=None, images_data=None,
+            videos_data=None) -> None:
+    if descriptions_data:
+        update_data_descriptions(curr_posts_data, descriptions_data)
+    if images_data:
+        update_data_paths(curr_posts_data, images_data)
+    if videos_data:
+        update_data_paths(curr_posts_data, videos_data)
+
+
+class AccountWork:
+    def __init__(self, key: AccountKey, posts_data: Dict[str, List],
+                 newest_post_id: Optional[str]=None):
+        self.key = key
+        self.posts_data = posts_data
+        self.newest_post_id = newest_post_id
+        self.posts_meta: Dict[str, PostMeta] = {}
+
+
+class CrawlPipeline:
+    """Profile scrape -> post metadata -> media download -> DB write.
+
+    Stages are connected by bounded queues, so every stage works on a
+    different account at the same time and a slow stage makes the ones
+    before it wait instead of piling up accounts in memory. ``None`` is
+    passed down the queues to shut the next stage down. The DB stage
+    buffers ``write_batch_size`` accounts per transaction.
+
+    An account that fails a stage is dropped from the rest of the pipeline,
+    ``run`` returns only the accounts that were written (or had no posts),
+    so the others can be released for another attempt.
+    """
+
+    def __init__(self, queue_size: int=PIPELINE_QUEUE_SIZE,
+                 incremental: bool=INCREMENTAL_CRAWL,
+                 write_batch_size: int=WRITE_BATCH_SIZE):
+        self.incremental = incremental
+        self.write_batch_size = max(write_batch_size, 1)
+        self.write_buffer: List[AccountWork] = []
+        self.meta_queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.media_queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.db_queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.finished: Set[str] = set()
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {
+            "meta": self.meta_queue.qsize(),
+            "media": self.media_queue.qsize(),
+            "db": self.db_queue.qsize(),
+            "write_buffer": len(self.write_buffer),
+        }
+
+    async def run_stage(self, name: str, in_queue: asyncio.Queue,
+                        out_queue: Optional[asyncio.Queue],
+                        handle: Callable[[AccountWork], Awaitable[None]])\
+            -> None:
+        while True:
+            work = await in_queue.get()
+            if work is None:
+                break
+
+            try:
+                await handle(work)
+            except Exception as stage_error:
+                logger.error(f"Pipeline {name} Stage Error In "
+                             f"{work.key[0]} -> {stage_error}")
+                continue
+
+            if out_queue is not None:
+                await out_queue.put(work)
+
+        if out_queue is not None:
+            await out_queue.put(None)
+
+    async def scrape_profile(self, pool: BrowserPool,
+                             account_url: str) -> Optional[AccountWork]:
+        account_name = account_url.strip("/").split("/")[-1]
+        known_ids = None
+        if self.incremental:
+            known_ids = await PostsDB().get_known_ids(account_name)
+
+        async with pool.page() as page:
+            profile = Page(account_url, page)
+            post_urls, follower_number = await profile.fetch_account_data(
+                account_name, known_ids=known_ids)
+
+        if not post_urls and not known_ids:
+            logger.warning(f"No Posts Found For {account_name}")
+            self.finished.add(account_name)
+            return None
+
+        posts_data = get_urls_dict([(post_urls, follower_number)])
+        posts_data = posts_data.get((account_name, follower_number), {})
+        if known_ids:
+            logger.info(f"{account_name} -> {len(posts_data)} New Posts, "
+                        f"{len(known_ids)} Already Known")
+        return AccountWork((account_name, follower_number), posts_data,
+                           profile.newest_post_id)
+
+    async def scrape_profiles(self, account_urls: List[str]) -> None:
+        pool = await get_browser_pool()
+        urls_queue: asyncio.Queue = asyncio.Queue()
+        for account_url in account_urls:
+            urls_queue.put_nowait(account_url)
+
+        async def worker() -> None:
+            while not urls_queue.empty():
+                account_url = urls_queue.get_nowait()
+                try:
+                    work = await self.scrape_profile(pool, account_url)
+                except Exception as profile_error:
+                    logger.error(f"Pipeline Profile Stage Error In "
+                                 f"{account_url} -> {profile_error}")
+                    continue
+
+                if work is not None:
+                    await self.meta_queue.put(work)
+
+        try:
+            await asyncio.gather(*[worker() for _ in range(pool.size)])
+        finally:
+            await self.meta_queue.put(None)
+
+    async def drop_seen_posts(self, work: AccountWork) -> None:
+        unique_ids = {get_unique_id(post_url): post_url
+                      for post_url in work.posts_data}
+        new_ids = await get_seen_set("posts").filter_new(
+            list(unique_ids))
+        if len(new_ids) < len(unique_ids):
+            logger.info(f"{work.key[0]} -> Skipping "
+                        f"{len(unique_ids) - len(new_ids)} Stored Posts")
+        work.posts_data = {unique_ids[unique_id]:
+                           work.posts_data[unique_ids[unique_id]]
+                           for unique_id in new_ids}
+
+    async def fetch_meta(self, work: AccountWork) -> None:
+        if work.posts_data:
+            await self.drop_seen_posts(work)
+        if not work.posts_data:
+            return
+        post_urls = [c for c in work.posts_data]
+        work.posts_meta = await get_posts_meta(post_urls)
+        update_data_types(work.posts_data, work.posts_meta)
+
+        descriptions_data = await get_descriptions(post_urls, work.posts_meta)
+        update_data(work.posts_data, descriptions_data)
+
+    async def download_media(self, work: AccountWork) -> None:
+        image_posts, _ = get_split_posts(work.posts_data)
+        images_data = await ImageDownload(image_posts, work.posts_meta)\
+            .download() if image_posts else None
+        update_data(work.posts_data, images_data=images_data)
+
+    async def write_db(self, work: AccountWork) -> None:
+        self.write_buffer.append(work)
+        if len(self.write_buffer) >= self.write_batch_size:
+            await self.flush_db()
+
+    async def flush_db(self) -> None:
+        works, self.write_buffer = self.write_buffer, []
+        if not works:
+            return
+
+        account_data = {work.key: work.posts_data for work in works}
+        newest_posts = {work.key[0]: work.newest_post_id for work in works
+                        if work.newest_post_id}
+        if not await WriteDB().write(account_data, newest_posts):
+            return
+
+        record_written(len(account_data),
+                       sum(len(posts_data)
+                           for posts_data in account_data.values()))
+        self.finished.update(work.key[0] for work in works)
+        get_seen_set("posts").add(get_unique_id(post_url)
+                                  for work in works
+                                  for post_url in work.posts_data)
+
+    async def run(self, account_urls: List[str]) -> Set[str]:
+        logger.info(f"Scraping Account Details... -> {account_urls}")
+        QUEUE_DEPTH.set_function(lambda: {
+            (queue,): depth for queue, depth in self.queue_depths().items()})
+        stages = [asyncio.ensure_future(stage) for stage in (
+            self.scrape_profiles(account_urls),
+            self.run_stage("Meta", self.meta_queue, self.media_queue,
+                           self.fetch_meta),
+            self.run_stage("Media", self.media_queue, self.db_queue,
+                           self.download_media),
+            self.run_stage("DB", self.db_queue, None, self.write_db),
+        )]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            # A failed stage would leave the others waiting on their queues,
+            # they are cancelled and awaited before the buffered accounts
+            # are written and the error is raised.
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            await self.flush_db()
+            QUEUE_DEPTH.set_function(None)
+        logger.info(f"Pipeline Finished {len(self.finished)} Of "
+                    f"{len(account_urls)} Accounts!")
+        return self.finished
+
+
+async def run_pipeline(account_urls: List[str]) -> Set[str]:
+    return await CrawlPipeline().run(account_urls)
@@ -0,0 +1,59 @@
+from typing import List, Optional, Tuple
+import aiohttp
+
+from crawler.collect_account_data import parse_profile_counts
+from crawler.collect_post_meta import fetch_og_meta
+from crawler.rate_control import get_rate_controller
+from crawler.http_client import get_http_session
+from crawler.worker_pool import WorkerPool
+from db.frontier import FrontierDB
+from utils.logger import get_logger
+from config.config import (HTTP_CONCURRENCY, HTTP_ITEM_TIMEOUT,
+                           PRESCORE_BATCH_SIZE, MIN_FOLLOWERS)
+
+logger = get_logger("crawler_logger")
+
+
+async def get_profile_counts(session: aiohttp.ClientSession,
+                             account: Tuple[int, str])\
+        -> Tuple[int, Optional[int], Optional[int]]:
+    account_id, account_url = account
+    try:
+        og = await get_rate_controller().run(
+            lambda: fetch_og_meta(session, account_url, stage="prescore"))
+        follower_number, post_number = parse_profile_counts(
+            og.get("og:description"))
+        return account_id, follower_number, post_number
+
+    except Exception as score_error:
+        logger.error(f"Pre-Score Request Error Occurred In "
+                     f"{account_url} -> {score_error}")
+        return account_id, None, None
+
+
+async def prescore_accounts(batch_size: int=PRESCORE_BATCH_SIZE,
+                            concurrency: int=HTTP_CONCURRENCY) -> int:
+    """Fetch follower and post counts of unscored frontier accounts.
+
+    One plain GET of the profile page gives its ``og:description``, which is
+    enough to rank the account (or leave it below ``MIN_FOLLOWERS``) before
+    a browser page is spent on it.
+    """
+    accounts = await FrontierDB().claim_unscored(batch_size)
+    if not accounts:
+        return 0
+
+    pool = WorkerPool(concurrency, HTTP_ITEM_TIMEOUT, name="Pre-Score")
+    session = get_http_session()
+    scores: List[Tuple[int, Optional[int], Optional[int]]] = \
+        await pool.map(lambda account: get_profile_counts(session, account),
+                       accounts,
+                       default=lambda account: (account[0], None, None))
+
+    await FrontierDB().save_scores(scores)
+    low_value = sum(1 for _, follower_number, post_number in scores
+                    if (follower_number is not None and
+                        follower_number < MIN_FOLLOWERS) or post_number == 0)
+    logger.info(f"Pre-Scored {len(scores)} Accounts, {low_value} Below "
+                f"{MIN_FOLLOWERS} Followers Or Without Posts")
+    return len(scores)
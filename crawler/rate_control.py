@@ -0,0 +1,201 @@
+from typing import Awaitable, Callable, Dict, Optional, TypeVar, Mapping
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from random import uniform
+from time import monotonic
+import asyncio
+
+import aiohttp
+from playwright.async_api import Error as PlaywrightError
+
+from utils.logger import get_logger
+from config.config import (RATE_MAX_CONCURRENCY, RATE_MAX_RETRIES,
+                           RATE_BACKOFF_BASE, RATE_BACKOFF_MAX,
+                           RATE_SLOW_SECONDS, CIRCUIT_FAILURES,
+                           CIRCUIT_OPEN_SECONDS)
+
+logger = get_logger("crawler_logger")
+
+T = TypeVar("T")
+
+# Errors that say the host or the network is struggling, next to
+# ThrottledError. Anything else (a 404, a page without og: tags) is a
+# content miss, which neither shrinks the limit nor gets retried.
+TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError, PlaywrightError)
+
+
+class ThrottledError(Exception):
+    def __init__(self, url: str, status: int,
+                 retry_after: Optional[float]=None):
+        super().__init__(f"{url} Responded With {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(),
+                   0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_status(url: str, status: int, headers: Mapping[str, str]) -> None:
+    if status == 429 or status >= 500:
+        retry_after = headers.get("Retry-After") or headers.get("retry-after")
+        raise ThrottledError(url, status, parse_retry_after(retry_after))
+
+
+class RateController:
+    """AIMD concurrency limit with retries and a circuit breaker.
+
+    Healthy responses raise the limit by one per window of requests, 429s,
+    5xx responses and network errors halve it and slow responses shrink it
+    a bit. Only requests started after the last decrease can shrink it
+    again, so a burst of in-flight failures halves it once, not once per
+    request. ``Retry-After`` pauses every caller of the controller. After
+    ``failures_to_open`` consecutive failures the circuit opens, callers
+    wait ``open_seconds`` and then a single probe request decides whether it
+    closes again.
+    """
+
+    def __init__(self, name: str, max_limit: int=RATE_MAX_CONCURRENCY,
+                 min_limit: int=1, max_retries: int=RATE_MAX_RETRIES,
+                 backoff_base: float=RATE_BACKOFF_BASE,
+                 backoff_max: float=RATE_BACKOFF_MAX,
+                 slow_seconds: float=RATE_SLOW_SECONDS,
+                 failures_to_open: int=CIRCUIT_FAILURES,
+                 open_seconds: float=CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = float(self.max_limit)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.slow_seconds = slow_seconds
+        self.failures_to_open = failures_to_open
+        self.open_seconds = open_seconds
+
+        self.in_flight = 0
+        self.failures = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.circuit_open = False
+        self.condition = asyncio.Condition()
+
+    def current_limit(self) -> int:
+        return 1 if self.circuit_open else int(self.limit)
+
+    async def acquire(self) -> None:
+        while True:
+            wait_time = self.paused_until - monotonic()
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+                continue
+
+            async with self.condition:
+                if self.paused_until > monotonic():
+                    continue
+                if self.in_flight < self.current_limit():
+                    self.in_flight += 1
+                    return
+                await self.condition.wait()
+
+    async def release(self) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def decrease(self, factor: float, start_time: float) -> None:
+        if start_time < self.last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.last_decrease = monotonic()
+
+    def on_response(self) -> None:
+        if self.circuit_open:
+            logger.info(f"{self.name} Circuit Closed, Responses Are Healthy")
+        self.circuit_open = False
+        self.failures = 0
+
+    def on_success(self, start_time: float) -> None:
+        self.on_response()
+        if monotonic() - start_time > self.slow_seconds:
+            self.decrease(0.9, start_time)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_failure(self, start_time: float,
+                   retry_after: Optional[float]=None) -> None:
+        self.failures += 1
+        self.decrease(0.5, start_time)
+
+        pause = retry_after or 0.0
+        if self.failures >= self.failures_to_open:
+            if not self.circuit_open:
+                logger.warning(f"{self.name} Circuit Opened After "
+                               f"{self.failures} Failures, Pausing "
+                               f"{self.open_seconds}s")
+            self.circuit_open = True
+            pause = max(pause, self.open_seconds)
+
+        if pause:
+            self.paused_until = max(self.paused_until, monotonic() + pause)
+
+    def backoff_delay(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return uniform(delay / 2, delay)
+
+    async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Call ``request`` under the limit, retrying throttles and network
+        errors. Other exceptions are raised right away."""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire()
+            start_time = monotonic()
+            try:
+                result = await request()
+
+            except ThrottledError as throttled_error:
+                self.on_failure(start_time, throttled_error.retry_after)
+                last_error: Exception = throttled_error
+                logger.warning(f"{self.name} Throttled -> {throttled_error}, "
+                               f"Limit {self.current_limit()}")
+
+            except TRANSIENT_ERRORS as request_error:
+                self.on_failure(start_time)
+                last_error = request_error
+
+            except Exception:
+                self.on_response()
+                raise
+
+            else:
+                self.on_success(start_time)
+                return result
+
+            finally:
+                await self.release()
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff_delay(attempt))
+
+        raise last_error
+
+
+rate_controllers: Dict[str, RateController] = {}
+
+
+def get_rate_controller(name: str="instagram") -> RateController:
+    if name not in rate_controllers:
+        rate_controllers[name] = RateController(name)
+    return rate_controllers[name]
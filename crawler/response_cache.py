@@ -0,0 +1,198 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from time import time
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+from utils.logger import get_logger
+from config.config import (ROOT_DIR, RESPONSE_CACHE, RESPONSE_CACHE_PATH,
+                           RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_BYTES)
+
+logger = get_logger("crawler_logger")
+
+
+def encode_value(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False)
+                         .encode("utf-8"))
+
+
+def decode_value(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class ResponseCache:
+    """URL keyed cache of extracted responses in a local SQLite file.
+
+    Values are stored as zlib compressed JSON, so a crashed cycle or a
+    development re-run reads post metadata from disk instead of requesting
+    it again. Entries older than ``ttl`` seconds are misses. Once the
+    stored values pass ``max_bytes``, the least recently read ones are
+    evicted until the cache is back under 90% of the cap.
+
+    SQLite calls block, the async methods run them in the default executor
+    behind one lock.
+    """
+
+    def __init__(self, path: str=RESPONSE_CACHE_PATH,
+                 ttl: float=RESPONSE_CACHE_TTL,
+                 max_bytes: int=RESPONSE_CACHE_MAX_BYTES):
+        self.path = os.path.join(ROOT_DIR, path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS responses_accessed_at
+            ON responses (accessed_at);
+            """)
+        self.total_bytes = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses;").fetchone()[0]
+
+    def get_many_sync(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        now = time()
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, value, stored_at FROM responses "
+                    f"WHERE key IN ({', '.join('?' * len(chunk))});",
+                    chunk).fetchall()
+                for key, value, stored_at in rows:
+                    if now - stored_at <= self.ttl:
+                        found[key] = decode_value(value)
+
+            self.conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?;",
+                [(now, key) for key in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many_sync(self, items: Iterable[Tuple[str, Any]]) -> None:
+        now = time()
+        rows = [(key, encode_value(value)) for key, value in items]
+        if not rows:
+            return
+
+        with self.lock:
+            added_bytes = 0
+            self.conn.execute("BEGIN;")
+            try:
+                for key, blob in rows:
+                    old_size = self.conn.execute(
+                        "SELECT size FROM responses WHERE key = ?;",
+                        (key,)).fetchone()
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO responses "
+                        "(key, value, size, stored_at, accessed_at) "
+                        "VALUES (?, ?, ?, ?, ?);",
+                        (key, blob, len(blob), now, now))
+                    added_bytes += len(blob) - (old_size[0] if old_size
+                                                else 0)
+                self.conn.execute("COMMIT;")
+            except BaseException:
+                # An open transaction would make every later BEGIN fail.
+                self.conn.execute("ROLLBACK;")
+                raise
+            self.total_bytes += added_bytes
+
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self) -> None:
+        target = self.max_bytes * 0.9
+        while self.total_bytes > target:
+            rows = self.conn.execute(
+                "SELECT key, size FROM responses "
+                "ORDER BY accessed_at LIMIT 1000;").fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+
+            evicted = []
+            for key, size in rows:
+                if self.total_bytes <= target:
+                    break
+                evicted.append((key,))
+                self.total_bytes -= size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?;",
+                                  evicted)
+            self.evictions += len(evicted)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_many_sync, keys)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def set_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.set_many_sync, list(items))
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.set_many([(key, value)])
+
+    def get_stats(self) -> Dict[str, float]:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "bytes": self.total_bytes,
+        }
+
+    def log_stats(self) -> None:
+        stats = self.get_stats()
+        logger.info(f"Response Cache -> {stats['hits']} Hits, "
+                    f"{stats['misses']} Misses "
+                    f"({stats['hit_rate']:.0%} Hit Rate), "
+                    f"{stats['evictions']} Evictions, "
+                    f"{stats['bytes'] // 1024}KB Stored")
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache, or None when ``RESPONSE_CACHE`` is off."""
+    global response_cache
+    if response_cache is None and RESPONSE_CACHE:
+        response_cache = ResponseCache()
+    return response_cache
+
+
+def close_response_cache() -> None:
+    global response_cache
+    if response_cache is not None:
+        response_cache.log_stats()
+        response_cache.close()
+        response_cache = None
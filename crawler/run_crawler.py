@@ -1,65 +1,98 @@
 import asyncio
-from typing import List, Dict, Tuple, Union
+from contextlib import asynccontextmanager
+from typing import List, Set, AsyncIterator
 from random import uniform
 
-from crawler.collect_account_data import get_accounts_data
+from crawler.browser import close_browser_pool
+from crawler.parse_executor import get_parse_executor, close_parse_executor
+from crawler.http_client import get_http_client, close_http_client
 from crawler.collect_new_accounts import get_following_accounts
-from crawler.collect_post_descriptions import get_descriptions, update_data_descriptions
-from crawler.install_content import VideoDownload, ImageDownload, update_data_paths
+from crawler.pipeline import run_pipeline
+from crawler.prescore import prescore_accounts
+from crawler.response_cache import get_response_cache, close_response_cache
+from crawler.seen_set import load_seen_sets
+from db import close_db_pool
 from db.handle_followers import FollowerDB
+from db.frontier import FrontierDB
 from db.create_table import CreateDB
-from db.write_data import WriteDB
-from db.update_posts import UpdateDB
 from cookies.handle import handle_cookies, check_login
 from utils.logger import get_logger
+from utils.metrics import start_metrics_server, close_metrics_server
+from config.config import LEASE_SECONDS, CLAIM_BATCH_SIZE
 
 logger = get_logger("crawler_logger")
 
 
-def get_split_posts(curr_post_data: Dict[str, List[Union[bool, str]]]) -> (
-        Tuple)[List[str], List[str]]:
-    image_posts, video_posts = [], []
-    for c in curr_post_data:
-        if curr_post_data[c][0]:
-            image_posts.append(c)
-        else:
-            video_posts.append(c)
-
-    return image_posts, video_posts
-
-
-def update_data(curr_posts_data, descriptions_data=None, images_data=None,
-            videos_data=None) -> None:
-    if descriptions_data:
-        update_data_descriptions(curr_posts_data, descriptions_data)
-    if images_data:
-        update_data_paths(curr_posts_data, images_data)
-    if videos_data:
-        update_data_paths(curr_posts_data, videos_data)
-
-
-async def get_data(account_urls: List[str]) -> (
-        Dict)[Tuple[str, int], Dict[str, List]]:
-    account_data = await get_accounts_data(account_urls)
-    logger.info(f"Scraping Account Details... -> {account_urls}")
-
-    for account_detail in account_data:
-        curr_posts_data = account_data[account_detail]
-        if curr_posts_data:
-            post_urls = [c for c in curr_posts_data]
-            descriptions_data = await get_descriptions(post_urls)
-            image_posts, video_posts = get_split_posts(curr_posts_data)
-
-            images_data = await ImageDownload(image_posts).download()\
-                if image_posts else None
-            # videos_data = await VideoDownload(video_posts).download()\
-            #     if video_posts else None
-            update_data(curr_posts_data, descriptions_data, images_data)
-
+@asynccontextmanager
+async def hold_leases(account_ids: List[int]) -> AsyncIterator[None]:
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            await FrontierDB().heartbeat(account_ids)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        yield
+    finally:
+        heartbeat_task.cancel()
+
+
+async def scrape_posts() -> bool:
+    claimed = await FrontierDB().claim("posts", CLAIM_BATCH_SIZE)
+    if not claimed:
+        return False
+
+    account_ids = [account_id for account_id, _, _ in claimed]
+    accounts_urls = [account_url for _, _, account_url in claimed]
+    logger.info(f"Account Urls -> {accounts_urls}")
+
+    finished: Set[str] = set()
+    try:
+        async with hold_leases(account_ids):
+            finished = await get_data(accounts_urls)
+    finally:
+        # Accounts that failed a stage keep posts_scraped = FALSE, so they
+        # are claimed again instead of waiting for RECRAWL_AGE_DAYS.
+        done_ids = [account_id for account_id, account_name, _ in claimed
+                    if account_name in finished]
+        failed_ids = [account_id for account_id in account_ids
+                      if account_id not in done_ids]
+        if done_ids:
+            await FrontierDB().release(done_ids, "posts", True)
+        if failed_ids:
+            logger.warning(f"{len(failed_ids)} Accounts Failed, Releasing "
+                           f"Them For Another Attempt")
+            await FrontierDB().release(failed_ids, "posts", False)
+    return True
+
+
+async def expand_frontier() -> bool:
+    follower_db = FollowerDB()
+    most_follower_user = await follower_db.get_most_follower_user()
+    if not most_follower_user:
+        return False
+
+    user_id, account_url = most_follower_user
+    async with hold_leases([user_id]):
+        following_accounts = await get_following_accounts(account_url)
+
+    await FrontierDB().enqueue(following_accounts)
+    await follower_db.update_scraped_following(user_id)
+    return True
+
+
+async def get_data(account_urls: List[str]) -> Set[str]:
+    finished = await run_pipeline(account_urls)
+
+    get_parse_executor().log_stats()
+    get_http_client().log_stats()
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        response_cache.log_stats()
     random_time = uniform(60, 120)
     logger.info(f"Sleeping For {int(random_time)} Seconds...")
     await asyncio.sleep(random_time)
-    return account_data
+    return finished
 
 
 async def run(accounts_urls: List[str]) -> None:
@@ -69,18 +102,29 @@ async def run(accounts_urls: List[str]) -> None:
     if not cookies_state or not login_state:
         return
 
-    CreateDB().create()
+    await CreateDB().create()
+    await FrontierDB().check_claim_plan("posts")
+    await FrontierDB().enqueue(accounts_urls)
+    await load_seen_sets()
+    await start_metrics_server()
     logger.info("Crawler Started Working...")
-    while True:
-        logger.info(f"Account Urls -> {accounts_urls}")
-        try:
-            account_data = await get_data(accounts_urls)
-            WriteDB().write(account_data)
-            UpdateDB().update(account_data)
-
-            most_follower_user_url = FollowerDB().get_most_follower_user()
-            accounts_urls = await get_following_accounts(most_follower_user_url)
-            await asyncio.sleep(uniform(30, 60))
-
-        except Exception as run_error:
-            logger.error(f"Main Loop Error -> {run_error}")
\ No newline at end of file
+    try:
+        while True:
+            try:
+                await prescore_accounts()
+                scraped = await scrape_posts()
+                expanded = await expand_frontier()
+                if not scraped and not expanded:
+                    logger.info("Frontier Is Empty Or Fully Leased")
+                await asyncio.sleep(uniform(30, 60))
+
+            except Exception as run_error:
+                logger.error(f"Main Loop Error -> {run_error}")
+
+    finally:
+        await close_browser_pool()
+        close_parse_executor()
+        await close_http_client()
+        close_response_cache()
+        await close_db_pool()
+        await close_metrics_server()
\ No newline at end of file
@@ -0,0 +1,88 @@
+from typing import Dict, Iterable, List
+from hashlib import blake2b
+from math import ceil, log
+import asyncio
+
+from db.seen import SeenDB, SEEN_COLUMNS
+from utils.logger import get_logger
+from config.config import SEEN_SET_ERROR_RATE, SEEN_SET_MIN_CAPACITY
+
+logger = get_logger("crawler_logger")
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(ceil(-capacity * log(error_rate) / log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item: str) -> Iterable[int]:
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(item))
+
+
+class SeenSet:
+    """Post ids that are already stored in Postgres.
+
+    Keys are bulk loaded into a Bloom filter at startup, which costs about
+    two bytes per key instead of a Python string each. A negative answer
+    is final; positives are confirmed against the database in one query
+    per batch, so ``filter_new`` is exact for everything loaded or added
+    by this process.
+    """
+
+    def __init__(self, kind: str, error_rate: float=SEEN_SET_ERROR_RATE):
+        self.kind = kind
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(SEEN_SET_MIN_CAPACITY, error_rate)
+        self.count = 0
+
+    async def load(self) -> None:
+        seen_db = SeenDB()
+        capacity = max(await seen_db.count(self.kind) * 2,
+                       SEEN_SET_MIN_CAPACITY)
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        self.count = 0
+        loop = asyncio.get_running_loop()
+        async for keys in seen_db.iter_key_batches(self.kind):
+            # Hashing a batch takes a while, keep it off the event loop.
+            await loop.run_in_executor(None, self.add, keys)
+
+        logger.info(f"Loaded {self.count} Seen {self.kind} Into "
+                    f"{len(self.bloom.bits) // 1024}KB Bloom Filter")
+
+    def add(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.bloom.add(key)
+            self.count += 1
+
+    async def filter_new(self, keys: List[str]) -> List[str]:
+        candidates = [key for key in keys if key in self.bloom]
+        existing = await SeenDB().get_existing(self.kind, candidates) \
+            if candidates else set()
+        return [key for key in keys if key not in existing]
+
+
+seen_sets: Dict[str, SeenSet] = {}
+
+
+def get_seen_set(kind: str) -> SeenSet:
+    if kind not in seen_sets:
+        seen_sets[kind] = SeenSet(kind)
+    return seen_sets[kind]
+
+
+async def load_seen_sets() -> None:
+    for kind in SEEN_COLUMNS:
+        await get_seen_set(kind).load()
@@ -0,0 +1,107 @@
+from typing import (Awaitable, Callable, List, Optional, TypeVar, Any,
+                    Tuple)
+from time import monotonic
+import asyncio
+
+from utils.logger import get_logger
+from config.config import REQUESTS_PER_SECOND
+
+logger = get_logger("crawler_logger")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float]=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+
+        async with self.lock:
+            self.refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+
+request_bucket: Optional[TokenBucket] = None
+
+
+def get_request_bucket() -> TokenBucket:
+    global request_bucket
+    if request_bucket is None:
+        request_bucket = TokenBucket(REQUESTS_PER_SECOND)
+    return request_bucket
+
+
+class WorkerPool:
+    """Sliding-window worker pool.
+
+    ``concurrency`` workers pull items from a shared queue, so a slow item
+    only holds its own slot. Every item takes a token from the process-wide
+    request bucket before it starts and is cancelled after ``item_timeout``
+    seconds, in which case ``default(item)`` is used as its result.
+    """
+
+    def __init__(self, concurrency: int, item_timeout: Optional[float]=None,
+                 bucket: Optional[TokenBucket]=None, name: str="Worker Pool",
+                 log_every: int=60):
+        self.concurrency = max(concurrency, 1)
+        self.item_timeout = item_timeout
+        self.bucket = bucket or get_request_bucket()
+        self.name = name
+        self.log_every = log_every
+
+    async def run_item(self, func: Callable[[T], Awaitable[R]], item: T,
+                       default: Callable[[T], R]) -> R:
+        await self.bucket.acquire()
+        try:
+            return await asyncio.wait_for(func(item), self.item_timeout)
+
+        except asyncio.TimeoutError:
+            logger.error(f"{self.name} Item Timed Out After "
+                         f"{self.item_timeout}s -> {item}")
+
+        except Exception as item_error:
+            logger.error(f"{self.name} Item Failed -> {item} {item_error}")
+
+        return default(item)
+
+    async def map(self, func: Callable[[T], Awaitable[R]], items: List[T],
+                  default: Callable[[T], Any]=lambda item: None) -> List[R]:
+        results: List[Any] = [None] * len(items)
+        queue: asyncio.Queue[Tuple[int, T]] = asyncio.Queue()
+        for index, item in enumerate(items):
+            queue.put_nowait((index, item))
+        done = 0
+
+        async def worker() -> None:
+            nonlocal done
+            while True:
+                try:
+                    index, item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                results[index] = await self.run_item(func, item, default)
+                done += 1
+                if done % self.log_every == 0:
+                    logger.info(f"{self.name} -> {done}/{len(items)} Done")
+
+        workers_number = min(self.concurrency, len(items))
+        await asyncio.gather(*[worker() for _ in range(workers_number)])
+        return results
@@ -1,25 +1,69 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import asyncio
 import os
 
 from dotenv import load_dotenv
-import psycopg2
+from psycopg import AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
 
 from config.config import ROOT_DIR
 
+load_dotenv(f"{ROOT_DIR}/db/.database_env")
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 60000))
+
+
+def get_conninfo(statement_timeout: int=DB_STATEMENT_TIMEOUT) -> str:
+    return make_conninfo(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+        options=f"-c statement_timeout={statement_timeout}"
+    )
+
+
+db_pool: Optional[AsyncConnectionPool] = None
+db_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def get_db_pool() -> AsyncConnectionPool:
+    """Process-wide connection pool shared by every ``DB`` subclass."""
+    global db_pool, db_pool_lock
+    if db_pool_lock is None:
+        db_pool_lock = asyncio.Lock()
+
+    async with db_pool_lock:
+        if db_pool is None:
+            pool = AsyncConnectionPool(get_conninfo(),
+                                       min_size=DB_POOL_MIN_SIZE,
+                                       max_size=DB_POOL_MAX_SIZE,
+                                       open=False)
+            await pool.open()
+            db_pool = pool
+    return db_pool
+
+
+async def close_db_pool() -> None:
+    global db_pool
+    if db_pool is not None:
+        await db_pool.close()
+        db_pool = None
+
 
 class DB:
-    def __init__(self):
-        load_dotenv(f"{ROOT_DIR}/db/.database_env")
-        self.db_name = os.getenv("DB_NAME")
-        self.db_user = os.getenv("DB_USER")
-        self.db_password = os.getenv("DB_PASSWORD")
-        self.db_host = os.getenv("DB_HOST")
-        self.db_port = os.getenv("DB_PORT")
-
-    def get_conn(self) -> psycopg2.connect:
-        return psycopg2.connect(
-            dbname=self.db_name,
-            user=self.db_user,
-            password=self.db_password,
-            host=self.db_host,
-            port=self.db_port
-        )
\ No newline at end of file
+    @asynccontextmanager
+    async def get_conn(self) -> AsyncIterator[AsyncConnection]:
+        """Borrow a pooled connection.
+
+        The block runs in one transaction, which is committed when it exits
+        normally and rolled back when it raises.
+        """
+        pool = await get_db_pool()
+        async with pool.connection() as conn:
+            yield conn
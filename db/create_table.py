@@ -1,30 +1,33 @@
-import psycopg2
+import asyncio
+
+from psycopg import AsyncCursor
 
 from db import DB
+from db.migrations import MigrateDB
 from utils.logger import get_logger
+from config.config import POSTS_PARTITIONS
 
 logger = get_logger("db_logger")
 
 
 class CreateDB(DB):
-    def create(self):
-        conn = self.get_conn()
-        cursor = conn.cursor()
-
+    async def create(self):
         try:
-            self.create_post_table(cursor)
-            self.create_account_table(cursor)
-            conn.commit()
+            async with self.get_conn() as conn, conn.cursor() as cursor:
+                await self.create_post_table(cursor)
+                await self.create_account_table(cursor)
 
         except Exception as create_error:
             logger.error(f"Error Occurred While Creating"
                          f"Database -> {create_error}")
+            return
 
-        finally:
-            cursor.close()
-            conn.close()
+        migrate_db = MigrateDB()
+        await migrate_db.migrate()
+        if POSTS_PARTITIONS > 0:
+            await migrate_db.partition_posts(POSTS_PARTITIONS)
 
-    def create_post_table(self, cursor: psycopg2) -> None:
+    async def create_post_table(self, cursor: AsyncCursor) -> None:
         post_table_query = """
             CREATE TABLE IF NOT EXISTS posts (
                 post_url VARCHAR(255) NOT NULL UNIQUE,
@@ -34,10 +37,10 @@ class CreateDB(DB):
                 description TEXT
             );
             """
-        cursor.execute(post_table_query)
+        await cursor.execute(post_table_query)
         logger.info("Post Table Is Created")
 
-    def create_account_table(self, cursor: psycopg2):
+    async def create_account_table(self, cursor: AsyncCursor):
         account_table_query = """
             CREATE TABLE IF NOT EXISTS accounts (
                 id BIGSERIAL PRIMARY KEY,
@@ -48,9 +51,9 @@ class CreateDB(DB):
                 posts_scraped BOOLEAN NOT NULL DEFAULT FALSE
             );
             """
-        cursor.execute(account_table_query)
+        await cursor.execute(account_table_query)
         logger.info("Account Table Is Created")
 
 
 if __name__ == '__main__':
-    CreateDB().create()
\ No newline at end of file
+    asyncio.run(CreateDB().create())
\ No newline at end of file
@@ -0,0 +1,106 @@
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from datetime import datetime
+
+from db import DB
+from utils.logger import get_logger
+from config.config import EXPORT_SAFETY_SECONDS
+
+logger = get_logger("db_logger")
+
+# table -> (columns, query). Rows come in (timestamp, key) watermark order,
+# the query takes the watermark to start after and the timestamp to stop
+# before (see get_export_bound).
+EXPORT_QUERIES: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "posts": (
+        ("unique_id", "post_url", "account_name", "follower_number",
+         "content_type", "download_path", "description", "created_at"),
+        """
+        SELECT posts.unique_id, posts.post_url, accounts.account_name,
+        accounts.follower_number, posts.content_type, posts.download_path,
+        posts.description, posts.created_at
+        FROM posts
+        JOIN accounts ON accounts.id = posts.account_id
+        WHERE (posts.created_at, posts.unique_id) >
+              (%s::TIMESTAMPTZ, %s::VARCHAR)
+        AND posts.created_at < %s::TIMESTAMPTZ
+        {filters}
+        ORDER BY posts.created_at, posts.unique_id;
+        """,
+    ),
+    # Accounts change after they are stored, so they are exported by
+    # updated_at and a re-export holds the latest version of each row.
+    "accounts": (
+        ("id", "account_name", "account_url", "follower_number",
+         "post_number", "following_scraped", "posts_scraped",
+         "last_crawled_at", "newest_post_id", "created_at", "updated_at"),
+        """
+        SELECT id, account_name, account_url, follower_number, post_number,
+        following_scraped, posts_scraped, last_crawled_at, newest_post_id,
+        created_at, updated_at
+        FROM accounts
+        WHERE (updated_at, id) > (%s::TIMESTAMPTZ, %s::BIGINT)
+        AND updated_at < %s::TIMESTAMPTZ
+        {filters}
+        ORDER BY updated_at, id;
+        """,
+    ),
+}
+
+# created_at and updated_at are NOW() of the writing transaction, its start
+# time, so a write that started before an export but commits after it has
+# rows behind the export's watermark. Rows are only exported up to the start
+# of the oldest transaction still open, and at least ``safety_seconds`` in
+# the past; later ones wait for the next run.
+EXPORT_BOUND_QUERY = """
+    SELECT LEAST(NOW() - make_interval(secs => %s), MIN(xact_start))
+    FROM pg_stat_activity
+    WHERE xact_start IS NOT NULL AND pid <> pg_backend_pid()
+    AND backend_type = 'client backend'
+    AND datname = current_database();
+"""
+
+WATERMARK_COLUMNS = {
+    "posts": ("created_at", "unique_id"),
+    "accounts": ("updated_at", "id"),
+}
+
+START_KEYS: Dict[str, Any] = {
+    "posts": "",
+    "accounts": 0,
+}
+
+
+def get_columns(table: str) -> Tuple[str, ...]:
+    return EXPORT_QUERIES[table][0]
+
+
+def get_row_watermark(table: str, row: tuple) -> Tuple[datetime, Any]:
+    columns = get_columns(table)
+    timestamp_column, key_column = WATERMARK_COLUMNS[table]
+    return row[columns.index(timestamp_column)], row[columns.index(key_column)]
+
+
+class ExportDB(DB):
+    async def iter_batches(self, table: str, watermark: Tuple[datetime, Any],
+                           batch_size: int, filters: str="",
+                           safety_seconds: float=EXPORT_SAFETY_SECONDS)\
+            -> AsyncIterator[List[tuple]]:
+        """Yield the rows of ``table`` after ``watermark``, ``batch_size``
+        at a time, from a server-side cursor.
+        """
+        _, export_query = EXPORT_QUERIES[table]
+        async with self.get_conn() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(EXPORT_BOUND_QUERY, (safety_seconds,))
+                export_bound = (await cursor.fetchone())[0]
+            logger.info(f"Exporting {table} Rows Written Before "
+                        f"{export_bound}")
+
+            async with conn.cursor(name=f"export_{table}") as cursor:
+                await cursor.execute(export_query.format(filters=filters),
+                                     (*watermark, export_bound))
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
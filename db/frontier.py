@@ -0,0 +1,267 @@
+from typing import Dict, Iterator, List, Tuple, Optional
+import asyncio
+import os
+import socket
+
+from db import DB
+from utils.logger import get_logger
+from utils.metrics import DB_SECONDS, DB_ERRORS
+from config.config import LEASE_SECONDS, RECRAWL_AGE_DAYS, MIN_FOLLOWERS
+
+logger = get_logger("db_logger")
+
+WORKER_ID = os.getenv("CRAWLER_WORKER_ID",
+                      f"{socket.gethostname()}-{os.getpid()}")
+
+FRONTIER_COLUMNS = {
+    "following": "following_scraped",
+    "posts": "posts_scraped",
+}
+
+# Pre-scored accounts below the follower threshold, or without posts for
+# post scraping, are never claimed. Unscored accounts (NULL) still are.
+FRONTIER_FILTERS = {
+    "following": "",
+    "posts": "AND (post_number IS NULL OR post_number > 0)",
+}
+
+
+# Partial indexes added by migration 6 that keep claims from sorting the
+# whole accounts table.
+FRONTIER_INDEXES = {
+    "following": "accounts_following_frontier_idx",
+    "posts": "accounts_posts_frontier_idx",
+}
+
+INDEX_SCAN_NODES = ("Index Scan", "Index Only Scan")
+
+
+def get_claim_query(kind: str) -> str:
+    scraped_column = FRONTIER_COLUMNS[kind]
+    return f"""
+        WITH claimed AS (
+            SELECT id FROM accounts
+            WHERE {scraped_column} = FALSE
+            AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+            AND (follower_number IS NULL OR follower_number >= %s)
+            {FRONTIER_FILTERS[kind]}
+            ORDER BY follower_number DESC NULLS LAST, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE accounts
+        SET lease_owner = %s,
+            lease_expires_at = NOW() + make_interval(secs => %s)
+        FROM claimed
+        WHERE accounts.id = claimed.id
+        RETURNING accounts.id, accounts.account_name, accounts.account_url;
+    """
+
+
+def iter_plan_nodes(plan: Dict) -> Iterator[Dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def get_account_name(account_url: str) -> str:
+    return account_url.rstrip("/").split("/")[-1]
+
+
+class FrontierDB(DB):
+    """Leases accounts to crawler workers.
+
+    ``claim`` locks unleased rows with ``FOR UPDATE SKIP LOCKED``, so any
+    number of workers can claim at the same time without getting the same
+    account. A lease lasts ``lease_seconds`` unless it is extended with
+    ``heartbeat``; rows of a crashed worker become claimable again once
+    their lease expires.
+    """
+
+    async def claim(self, kind: str, limit: int,
+                    lease_seconds: int=LEASE_SECONDS)\
+            -> List[Tuple[int, str, str]]:
+        return await self.execute(get_claim_query(kind),
+                                  (MIN_FOLLOWERS, limit, WORKER_ID,
+                                   lease_seconds),
+                                  fetch=True,
+                                  action=f"Claiming {kind} Accounts")
+
+    async def check_claim_plan(self, kind: str="posts") -> bool:
+        """Check with EXPLAIN that an index serves the claim query's order.
+
+        Sequential and bitmap scans are turned off for the check, the
+        planner rightly prefers them while the table is small. What matters
+        is that the ``ORDER BY ... LIMIT`` can stop early on an index
+        instead of sorting every account.
+        """
+        try:
+            async with self.get_conn() as conn, conn.cursor() as cursor:
+                await cursor.execute("SET LOCAL enable_seqscan = off;")
+                await cursor.execute("SET LOCAL enable_bitmapscan = off;")
+                await cursor.execute(
+                    f"EXPLAIN (FORMAT JSON) {get_claim_query(kind)}",
+                    (MIN_FOLLOWERS, 1, WORKER_ID, LEASE_SECONDS))
+                plan = (await cursor.fetchone())[0][0]["Plan"]
+
+        except Exception as explain_error:
+            logger.error(f"Error Occurred While Explaining {kind} "
+                         f"Claim Query -> {explain_error}")
+            return False
+
+        nodes = list(iter_plan_nodes(plan))
+        index_names = [node.get("Index Name") for node in nodes
+                       if node["Node Type"] in INDEX_SCAN_NODES]
+        uses_index = FRONTIER_INDEXES[kind] in index_names
+        sorts = any(node["Node Type"] == "Sort" for node in nodes)
+        if uses_index and not sorts:
+            logger.info(f"{kind} Claim Query Uses {FRONTIER_INDEXES[kind]}")
+            return True
+
+        logger.warning(f"{kind} Claim Query Does Not Use "
+                       f"{FRONTIER_INDEXES[kind]} -> "
+                       f"{[node['Node Type'] for node in nodes]}")
+        return False
+
+    async def heartbeat(self, account_ids: List[int],
+                  lease_seconds: int=LEASE_SECONDS) -> None:
+        heartbeat_query = """
+            UPDATE accounts
+            SET lease_expires_at = NOW() + make_interval(secs => %s)
+            WHERE id = ANY(%s) AND lease_owner = %s;
+        """
+        await self.execute(heartbeat_query, (lease_seconds, account_ids, WORKER_ID),
+                     action="Extending Account Leases")
+
+    async def release(self, account_ids: List[int], kind: str,
+                done: bool=True) -> None:
+        scraped_column = FRONTIER_COLUMNS[kind]
+        done_update = f", {scraped_column} = TRUE" if done else ""
+        release_query = f"""
+            UPDATE accounts
+            SET lease_owner = NULL, lease_expires_at = NULL{done_update}
+            WHERE id = ANY(%s) AND lease_owner = %s;
+        """
+        await self.execute(release_query, (account_ids, WORKER_ID),
+                     action=f"Releasing {kind} Accounts")
+
+    async def enqueue(self, account_urls: List[str],
+                recrawl_age_days: float=RECRAWL_AGE_DAYS) -> Tuple[int, int]:
+        """Add discovered accounts to the frontier in one statement.
+
+        Unknown accounts are inserted, already scraped accounts are put
+        back into the post frontier only when their last crawl is older
+        than ``recrawl_age_days`` (``0`` never re-crawls). Only those
+        recently crawled accounts are logged as skipped, accounts still
+        waiting in the frontier are logged as already queued. Returns the
+        number of inserted and re-queued accounts.
+        """
+        names = list(dict.fromkeys(get_account_name(url)
+                                   for url in account_urls if url))
+        if not names:
+            return 0, 0
+
+        enqueue_query = """
+            WITH discovered AS (
+                SELECT UNNEST(%s::VARCHAR[]) AS name
+            ),
+            inserted AS (
+                INSERT INTO accounts (account_name, account_url)
+                SELECT name, 'https://www.instagram.com/' || name || '/'
+                FROM discovered
+                ON CONFLICT DO NOTHING
+                RETURNING account_name
+            ),
+            requeued AS (
+                UPDATE accounts
+                SET posts_scraped = FALSE
+                FROM discovered
+                WHERE accounts.account_name = discovered.name
+                AND accounts.posts_scraped = TRUE
+                AND %s > 0
+                AND (accounts.last_crawled_at IS NULL OR
+                     accounts.last_crawled_at <
+                     NOW() - make_interval(secs => %s))
+                RETURNING accounts.account_name
+            ),
+            recent AS (
+                SELECT accounts.account_name
+                FROM accounts
+                JOIN discovered ON accounts.account_name = discovered.name
+                WHERE accounts.posts_scraped = TRUE
+                AND NOT (%s > 0 AND
+                         (accounts.last_crawled_at IS NULL OR
+                          accounts.last_crawled_at <
+                          NOW() - make_interval(secs => %s)))
+            )
+            SELECT (SELECT COUNT(*) FROM inserted),
+                   (SELECT COUNT(*) FROM requeued),
+                   (SELECT COUNT(*) FROM recent);
+        """
+        recrawl_seconds = recrawl_age_days * 86400
+        rows = await self.execute(enqueue_query,
+                            (names, recrawl_seconds, recrawl_seconds,
+                             recrawl_seconds, recrawl_seconds),
+                            fetch=True, action="Enqueueing Accounts")
+        inserted, requeued, recent = rows[0] if rows else (0, 0, 0)
+        # The rest are already known and still waiting in the frontier.
+        queued = len(names) - inserted - requeued - recent
+        logger.info(f"Frontier -> {inserted} New, {requeued} Re-Crawl, "
+                    f"{recent} Skipped As Recently Crawled, {queued} Already "
+                    f"Queued Of {len(names)} Discovered Accounts")
+        return inserted, requeued
+
+    async def claim_unscored(self, limit: int) -> List[Tuple[int, str]]:
+        claim_query = """
+            WITH claimed AS (
+                SELECT id FROM accounts
+                WHERE prescored_at IS NULL AND posts_scraped = FALSE
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE accounts
+            SET prescored_at = NOW()
+            FROM claimed
+            WHERE accounts.id = claimed.id
+            RETURNING accounts.id, accounts.account_url;
+        """
+        return await self.execute(claim_query, (limit,), fetch=True,
+                            action="Claiming Accounts To Pre-Score")
+
+    async def save_scores(self, scores: List[Tuple[int, Optional[int],
+                                             Optional[int]]]) -> None:
+        if not scores:
+            return
+
+        scores_query = """
+            UPDATE accounts
+            SET follower_number = COALESCE(scored.follower_number,
+                                           accounts.follower_number),
+            post_number = COALESCE(scored.post_number, accounts.post_number)
+            FROM UNNEST(%s::BIGINT[], %s::BIGINT[], %s::BIGINT[])
+                AS scored(id, follower_number, post_number)
+            WHERE accounts.id = scored.id;
+        """
+        account_ids, follower_numbers, post_numbers = map(list, zip(*scores))
+        await self.execute(scores_query,
+                     (account_ids, follower_numbers, post_numbers),
+                     action="Saving Account Scores")
+
+    async def execute(self, query: str, params: tuple, fetch: bool=False,
+                action: str="Updating Frontier") -> List[tuple]:
+        operation = action.lower().replace(" ", "_")
+        try:
+            with DB_SECONDS.time(operation=operation):
+                async with self.get_conn() as conn, conn.cursor() as cursor:
+                    await cursor.execute(query, params)
+                    return await cursor.fetchall() if fetch else []
+
+        except Exception as frontier_error:
+            DB_ERRORS.inc(operation=operation)
+            logger.error(f"Error Occurred While {action} -> {frontier_error}")
+            return []
+
+
+if __name__ == '__main__':
+    print(asyncio.run(FrontierDB().claim("following", 1)))
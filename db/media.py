@@ -0,0 +1,112 @@
+from typing import AsyncIterator, Dict, List, Tuple
+import asyncio
+
+from db import DB
+from utils.logger import get_logger
+from utils.metrics import DB_SECONDS, DB_ROWS, DB_ERRORS
+
+logger = get_logger("db_logger")
+
+
+class MediaDB(DB):
+    """``sha256 -> path`` index of the content-addressed media store, and
+    the file each post's ``unique_id`` was downloaded to."""
+
+    async def record(self, files: List[Tuple[str, str, int]],
+                     post_files: List[Tuple[str, str]]=()) -> None:
+        """Record ``(sha256, path, size)`` files and the
+        ``(unique_id, sha256)`` posts they were downloaded for."""
+        if not files:
+            return
+
+        record_query = """
+            INSERT INTO media_files (sha256, path, size)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (sha256) DO UPDATE
+            SET path = EXCLUDED.path, size = EXCLUDED.size,
+            verified_at = NOW()
+        """
+        post_media_query = """
+            INSERT INTO post_media (unique_id, sha256)
+            VALUES (%s, %s)
+            ON CONFLICT (unique_id) DO UPDATE
+            SET sha256 = EXCLUDED.sha256
+        """
+        try:
+            with DB_SECONDS.time(operation="media_record"):
+                async with self.get_conn() as conn, conn.cursor() as cursor:
+                    await cursor.executemany(record_query,
+                                             list(dict.fromkeys(files)))
+                    if post_files:
+                        await cursor.executemany(post_media_query,
+                                                 list(dict(post_files)
+                                                      .items()))
+            DB_ROWS.inc(len(files), table="media_files")
+            DB_ROWS.inc(len(post_files), table="post_media")
+
+        except Exception as media_error:
+            DB_ERRORS.inc(operation="media_record")
+            logger.error(f"Error Occurred While Recording "
+                         f"Media Files -> {media_error}")
+
+    async def get_post_files(self, unique_ids: List[str])\
+            -> Dict[str, Tuple[str, str, int]]:
+        """``unique_id -> (sha256, path, size)`` of posts with a file."""
+        try:
+            async with self.get_conn() as conn, conn.cursor() as cursor:
+                await cursor.execute("""
+                    SELECT post_media.unique_id, media_files.sha256,
+                    media_files.path, media_files.size
+                    FROM post_media
+                    JOIN media_files USING (sha256)
+                    WHERE post_media.unique_id = ANY(%s);
+                    """, (unique_ids,))
+                return {unique_id: (digest, path, size) for
+                        unique_id, digest, path, size
+                        in await cursor.fetchall()}
+
+        except Exception as media_error:
+            logger.error(f"Error Occurred While Reading Post "
+                         f"Media Files -> {media_error}")
+            return {}
+
+    async def iter_file_batches(self, itersize: int=1000)\
+            -> AsyncIterator[List[Tuple[str, str, int]]]:
+        async with self.get_conn() as conn:
+            async with conn.cursor(name="media_files") as cursor:
+                await cursor.execute(
+                    "SELECT sha256, path, size FROM media_files;")
+                while True:
+                    rows = await cursor.fetchmany(itersize)
+                    if not rows:
+                        break
+                    yield rows
+
+    async def mark_verified(self, digests: List[str]) -> None:
+        async with self.get_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute("""
+                UPDATE media_files SET verified_at = NOW()
+                WHERE sha256 = ANY(%s);
+                """, (digests,))
+
+    async def delete(self, files: List[Tuple[str, str, int]]) -> None:
+        # Posts pointing at a dropped file are left without a download,
+        # like a post whose download failed.
+        digests = [digest for digest, _, _ in files]
+        paths = [path for _, path, _ in files]
+        async with self.get_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute("""
+                DELETE FROM media_files WHERE sha256 = ANY(%s);
+                """, (digests,))
+            await cursor.execute("""
+                UPDATE posts SET download_path = ''
+                WHERE download_path = ANY(%s);
+                """, (paths,))
+
+
+if __name__ == '__main__':
+    async def main() -> None:
+        async for files in MediaDB().iter_file_batches():
+            print(files)
+
+    asyncio.run(main())
@@ -0,0 +1,275 @@
+from typing import List, Set, Tuple
+import asyncio
+
+from psycopg import AsyncCursor
+
+from db import DB
+from utils.logger import get_logger
+
+logger = get_logger("db_logger")
+
+# Any constant works, it only has to be the same for every crawler process.
+MIGRATION_LOCK_ID = 7243115
+
+# (version, name, statements). Applied migrations are recorded in
+# schema_migrations and never run again, so never edit or reorder one that
+# was released, append a new version instead.
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, "account lease columns", """
+        ALTER TABLE accounts
+        ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+    """),
+    (2, "account crawl columns", """
+        ALTER TABLE accounts
+        ADD COLUMN IF NOT EXISTS last_crawled_at TIMESTAMPTZ,
+        ADD COLUMN IF NOT EXISTS newest_post_id VARCHAR(255);
+    """),
+    (3, "account score columns", """
+        ALTER TABLE accounts
+        ADD COLUMN IF NOT EXISTS post_number INT,
+        ADD COLUMN IF NOT EXISTS prescored_at TIMESTAMPTZ;
+    """),
+    (4, "bigint follower number", """
+        ALTER TABLE accounts
+        ALTER COLUMN follower_number TYPE BIGINT,
+        ALTER COLUMN post_number TYPE BIGINT;
+    """),
+    (5, "created and updated timestamps", """
+        ALTER TABLE accounts
+        ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL
+            DEFAULT NOW(),
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL
+            DEFAULT NOW();
+        ALTER TABLE posts
+        ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL
+            DEFAULT NOW(),
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL
+            DEFAULT NOW();
+
+        CREATE OR REPLACE FUNCTION set_updated_at() RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.updated_at = NOW();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS accounts_set_updated_at ON accounts;
+        CREATE TRIGGER accounts_set_updated_at BEFORE UPDATE ON accounts
+            FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+        DROP TRIGGER IF EXISTS posts_set_updated_at ON posts;
+        CREATE TRIGGER posts_set_updated_at BEFORE UPDATE ON posts
+            FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+    """),
+    (6, "frontier indexes", """
+        CREATE INDEX IF NOT EXISTS accounts_posts_frontier_idx
+            ON accounts (follower_number DESC NULLS LAST, id)
+            WHERE posts_scraped = FALSE;
+        CREATE INDEX IF NOT EXISTS accounts_following_frontier_idx
+            ON accounts (follower_number DESC NULLS LAST, id)
+            WHERE following_scraped = FALSE;
+        CREATE INDEX IF NOT EXISTS accounts_unscored_idx
+            ON accounts (id)
+            WHERE prescored_at IS NULL AND posts_scraped = FALSE;
+    """),
+    (7, "posts account foreign key", """
+        ALTER TABLE posts
+        ADD COLUMN IF NOT EXISTS account_id BIGINT REFERENCES accounts (id);
+
+        -- Post urls look like https://www.instagram.com/<account>/p/<id>/,
+        -- owners missing from accounts were scraped before they were stored.
+        INSERT INTO accounts (account_name, account_url, posts_scraped)
+        SELECT DISTINCT split_part(post_url, '/', 4),
+        'https://www.instagram.com/' || split_part(post_url, '/', 4) || '/',
+        TRUE
+        FROM posts
+        WHERE account_id IS NULL
+        ON CONFLICT DO NOTHING;
+
+        UPDATE posts
+        SET account_id = accounts.id
+        FROM accounts
+        WHERE posts.account_id IS NULL
+        AND accounts.account_name = split_part(posts.post_url, '/', 4);
+
+        ALTER TABLE posts ALTER COLUMN account_id SET NOT NULL;
+        CREATE INDEX IF NOT EXISTS posts_account_id_idx ON posts (account_id);
+    """),
+    (8, "media files", """
+        CREATE TABLE IF NOT EXISTS media_files (
+            sha256 CHAR(64) PRIMARY KEY,
+            path VARCHAR(255) NOT NULL,
+            size BIGINT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            verified_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """),
+    (9, "posts export order index", """
+        CREATE INDEX IF NOT EXISTS posts_created_at_idx
+            ON posts (created_at, unique_id);
+    """),
+    (10, "accounts export order index", """
+        CREATE INDEX IF NOT EXISTS accounts_updated_at_idx
+            ON accounts (updated_at, id);
+    """),
+    (11, "post media files", """
+        -- Written with the media files, before the post itself is stored,
+        -- so a retried post finds the file it already downloaded.
+        CREATE TABLE IF NOT EXISTS post_media (
+            unique_id VARCHAR(255) PRIMARY KEY,
+            sha256 CHAR(64) NOT NULL
+                REFERENCES media_files (sha256) ON DELETE CASCADE,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """),
+]
+
+
+# Optional conversions are recorded in schema_migrations as well, under
+# versions far above the regular ones so appending migrations never
+# collides with them.
+POSTS_PARTITION_VERSION = 1001
+
+# Secondary indexes of posts, created again on the partitioned table as
+# dropping the old one drops them. Unique keys can't be enforced without
+# account_id there, so unique_id gets a plain index for SeenDB and
+# get_known_ids. Add new posts indexes here as well as in a migration.
+PARTITIONED_POSTS_INDEXES = """
+    CREATE INDEX IF NOT EXISTS posts_account_id_idx ON posts (account_id);
+    CREATE INDEX IF NOT EXISTS posts_created_at_idx
+        ON posts (created_at, unique_id);
+    CREATE INDEX IF NOT EXISTS posts_unique_id_idx ON posts (unique_id);
+"""
+
+
+class MigrateDB(DB):
+    """Applies the pending ``MIGRATIONS`` in version order.
+
+    Everything runs in one transaction under an advisory lock, so workers
+    starting at the same time wait for the first one instead of racing it,
+    and a failing migration leaves the schema untouched.
+    """
+
+    async def migrate(self) -> List[int]:
+        applied_now = []
+        try:
+            async with self.get_conn() as conn, conn.cursor() as cursor:
+                # Table rewrites can outlast the pool's statement timeout.
+                await cursor.execute("SET LOCAL statement_timeout = 0;")
+                await cursor.execute("SELECT pg_advisory_xact_lock(%s);",
+                                     (MIGRATION_LOCK_ID,))
+                await self.create_migrations_table(cursor)
+                applied = await self.get_applied(cursor)
+
+                for version, name, statements in MIGRATIONS:
+                    if version in applied:
+                        continue
+                    await cursor.execute(statements)
+                    await cursor.execute("""
+                        INSERT INTO schema_migrations (version, name)
+                        VALUES (%s, %s);
+                        """, (version, name))
+                    applied_now.append(version)
+                    logger.info(f"Applied Migration {version} -> {name}")
+
+        except Exception as migrate_error:
+            logger.error(f"Error Occurred While Migrating "
+                         f"Database -> {migrate_error}")
+            return []
+
+        if not applied_now:
+            logger.info("Database Schema Is Up To Date")
+        return applied_now
+
+    async def partition_posts(self, partitions: int) -> bool:
+        """Turn ``posts`` into a table hash partitioned by ``account_id``.
+
+        Per-account queries then only touch one partition. Unique keys of a
+        partitioned table have to contain ``account_id``, which is fine as
+        a post never changes its owner. The rows are copied over, the
+        secondary indexes rebuilt and the conversion recorded as migration
+        ``POSTS_PARTITION_VERSION``, all in a single transaction. A table
+        that is already partitioned only gets its missing indexes back.
+        """
+        try:
+            async with self.get_conn() as conn, conn.cursor() as cursor:
+                await cursor.execute("SET LOCAL statement_timeout = 0;")
+                await cursor.execute("SELECT pg_advisory_xact_lock(%s);",
+                                     (MIGRATION_LOCK_ID,))
+                await self.create_migrations_table(cursor)
+                if POSTS_PARTITION_VERSION in await self.get_applied(cursor):
+                    return False
+
+                await cursor.execute("""
+                    SELECT 1 FROM pg_partitioned_table
+                    WHERE partrelid = 'posts'::regclass;
+                    """)
+                if not await cursor.fetchone():
+                    await self.copy_to_partitions(cursor, partitions)
+
+                await cursor.execute(PARTITIONED_POSTS_INDEXES)
+                await cursor.execute("""
+                    INSERT INTO schema_migrations (version, name)
+                    VALUES (%s, %s);
+                    """, (POSTS_PARTITION_VERSION,
+                          f"posts hash partitions ({partitions})"))
+
+        except Exception as partition_error:
+            logger.error(f"Error Occurred While Partitioning "
+                         f"Posts -> {partition_error}")
+            return False
+
+        logger.info(f"Partitioned Posts Into {partitions} Hash Partitions")
+        return True
+
+    async def copy_to_partitions(self, cursor: AsyncCursor,
+                                 partitions: int) -> None:
+        await cursor.execute("""
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = 'posts'::regclass AND attnum > 0
+            AND NOT attisdropped
+            ORDER BY attnum;
+            """)
+        columns = ", ".join(f'"{column}"'
+                            for column, in await cursor.fetchall())
+
+        await cursor.execute("""
+            CREATE TABLE posts_partitioned (
+                LIKE posts INCLUDING DEFAULTS,
+                PRIMARY KEY (account_id, unique_id),
+                UNIQUE (account_id, post_url),
+                FOREIGN KEY (account_id) REFERENCES accounts (id)
+            ) PARTITION BY HASH (account_id);
+            """)
+        for remainder in range(partitions):
+            await cursor.execute(f"""
+                CREATE TABLE posts_p{remainder}
+                PARTITION OF posts_partitioned
+                FOR VALUES WITH (MODULUS {partitions},
+                                 REMAINDER {remainder});
+                """)
+        await cursor.execute(f"""
+            INSERT INTO posts_partitioned ({columns})
+            SELECT {columns} FROM posts;
+            DROP TABLE posts;
+            ALTER TABLE posts_partitioned RENAME TO posts;
+            CREATE TRIGGER posts_set_updated_at BEFORE UPDATE ON posts
+                FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+            """)
+
+    async def create_migrations_table(self, cursor: AsyncCursor) -> None:
+        await cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """)
+
+    async def get_applied(self, cursor: AsyncCursor) -> Set[int]:
+        await cursor.execute("SELECT version FROM schema_migrations;")
+        return {version for version, in await cursor.fetchall()}
+
+
+if __name__ == '__main__':
+    print(asyncio.run(MigrateDB().migrate()))
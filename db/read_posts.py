@@ -0,0 +1,32 @@
+from typing import Set
+import asyncio
+
+from db import DB
+from utils.logger import get_logger
+
+logger = get_logger("db_logger")
+
+
+class PostsDB(DB):
+    async def get_known_ids(self, account_name: str) -> Set[str]:
+        # The sub-select is run once before the scan, so the account_id
+        # index (or the account's partition) is used.
+        known_ids_query = """
+            SELECT unique_id FROM posts
+            WHERE account_id = (
+                SELECT id FROM accounts WHERE account_name = %s
+            );
+        """
+        try:
+            async with self.get_conn() as conn, conn.cursor() as cursor:
+                await cursor.execute(known_ids_query, (account_name,))
+                return {unique_id for unique_id, in await cursor.fetchall()}
+
+        except Exception as read_error:
+            logger.error(f"Error Occurred While Reading Known Posts "
+                         f"Of {account_name} -> {read_error}")
+            return set()
+
+
+if __name__ == '__main__':
+    print(asyncio.run(PostsDB().get_known_ids("georgehotz")))
@@ -0,0 +1,40 @@
+from typing import AsyncIterator, List, Set
+
+from db import DB
+from utils.logger import get_logger
+
+logger = get_logger("db_logger")
+
+# Discovered accounts have no seen-set, FrontierDB.enqueue filters them in
+# one statement that also applies the re-crawl age.
+SEEN_COLUMNS = {
+    "posts": ("posts", "unique_id"),
+}
+
+
+class SeenDB(DB):
+    async def count(self, kind: str) -> int:
+        table, _ = SEEN_COLUMNS[kind]
+        async with self.get_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute(f"SELECT COUNT(*) FROM {table};")
+            return (await cursor.fetchone())[0]
+
+    async def iter_key_batches(self, kind: str, itersize: int=50000)\
+            -> AsyncIterator[List[str]]:
+        table, column = SEEN_COLUMNS[kind]
+        async with self.get_conn() as conn:
+            # Named cursors are server-side, rows arrive in itersize batches.
+            async with conn.cursor(name=f"seen_{kind}") as cursor:
+                await cursor.execute(f"SELECT {column} FROM {table};")
+                while True:
+                    rows = await cursor.fetchmany(itersize)
+                    if not rows:
+                        break
+                    yield [key for key, in rows]
+
+    async def get_existing(self, kind: str, keys: List[str]) -> Set[str]:
+        table, column = SEEN_COLUMNS[kind]
+        async with self.get_conn() as conn, conn.cursor() as cursor:
+            await cursor.execute(f"SELECT {column} FROM {table} "
+                                 f"WHERE {column} = ANY(%s);", (keys,))
+            return {key for key, in await cursor.fetchall()}
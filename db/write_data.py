@@ -1,12 +1,19 @@
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
+from time import perf_counter
 
-from psycopg2.extras import execute_values
+from psycopg import AsyncCursor
 
 from db import DB
 from utils.logger import get_logger
+from utils.metrics import DB_SECONDS, DB_ROWS, DB_ERRORS
 
 logger = get_logger("db_logger")
 
+POST_COLUMNS = ("post_url", "unique_id", "content_type", "download_path",
+                "description", "account_name")
+ACCOUNT_COLUMNS = ("account_name", "account_url", "follower_number",
+                   "newest_post_id")
+
 
 def add_unique_id(post_insert_data: List[List]) -> None:
     for post in post_insert_data:
@@ -21,59 +28,119 @@ def add_account_url(account_insert_data: List[List]) -> None:
         account.insert(1, account_url)
 
 
-def add_posts_scraped(account_insert_data: List[List]) -> None:
+def add_newest_post_id(account_insert_data: List[List],
+                       newest_posts: Dict[str, str]) -> None:
     for account in account_insert_data:
-        account.append(True)
+        account.append(newest_posts.get(account[0]))
 
 
 class WriteDB(DB):
-    def write(self, account_data: Dict[Tuple[str, int], Dict[str, List]]):
-        self.conn = self.get_conn()
-        self.cursor = self.conn.cursor()
-
+    """Bulk ingest of a crawl cycle.
+
+    Post and account rows are streamed with ``COPY FROM STDIN`` into
+    temporary staging tables (unlogged and dropped on commit) and merged
+    into ``posts`` and ``accounts`` with ``INSERT ... ON CONFLICT``. The
+    accounts are marked as scraped in the same transaction, before the
+    posts are merged so every post can be given its ``account_id``.
+    """
+
+    async def write(self, account_data: Dict[Tuple[str, int],
+                                             Dict[str, List]],
+                    newest_posts: Optional[Dict[str, str]]=None) -> bool:
+        post_insert_data = []
+        for curr_account in account_data:
+            curr_post_data = account_data[curr_account]
+            post_insert_data.extend([post_url] + curr_post_data[post_url] +
+                                    [curr_account[0]]
+                                    for post_url in curr_post_data)
+        add_unique_id(post_insert_data)
+
+        account_insert_data = [list(account) for account in account_data]
+        add_account_url(account_insert_data)
+        add_newest_post_id(account_insert_data, newest_posts or {})
+
+        start_time = perf_counter()
         try:
-            for curr_account in account_data:
-                account_name, follower = curr_account
-                curr_post_data = account_data[curr_account]
-                post_insert_data = [[post_url] + curr_post_data[post_url]
-                                    for post_url in curr_post_data]
-                add_unique_id(post_insert_data)
-                self.write_post_data(post_insert_data)
-                logger.info(f"Written {account_name} Posts Data To Database!")
-
-            account_insert_data = [list(account) for account in account_data]
-            add_account_url(account_insert_data)
-            add_posts_scraped(account_insert_data)
-            self.write_account_data(account_insert_data)
+            async with self.get_conn() as conn, conn.cursor() as cursor:
+                await self.create_staging_tables(cursor)
+                await self.copy_rows(cursor, "posts_staging", POST_COLUMNS,
+                                     post_insert_data)
+                await self.copy_rows(cursor, "accounts_staging",
+                                     ACCOUNT_COLUMNS, account_insert_data)
+                await self.merge_account_data(cursor)
+                await self.merge_post_data(cursor)
 
         except Exception as write_error:
+            DB_ERRORS.inc(operation="write")
             logger.error(f"Error Occurred While "
                          f"Writing Post Data To Database -> {write_error}")
-
-        finally:
-            self.cursor.close()
-            self.conn.close()
-
-    def write_post_data(self,post_insert_data: List[List]):
-        insert_query = """
+            return False
+
+        elapsed = perf_counter() - start_time
+        DB_SECONDS.observe(elapsed, operation="write")
+        DB_ROWS.inc(len(post_insert_data), table="posts")
+        DB_ROWS.inc(len(account_insert_data), table="accounts")
+        rows = len(post_insert_data) + len(account_insert_data)
+        logger.info(f"Written {len(post_insert_data)} Posts And "
+                    f"{len(account_insert_data)} Accounts To Database In "
+                    f"{elapsed:.2f}s ({rows / max(elapsed, 1e-6):.0f} Rows/s)")
+        return True
+
+    async def create_staging_tables(self, cursor: AsyncCursor) -> None:
+        # Temporary tables skip the WAL like unlogged ones and are private
+        # to the connection, so concurrent writers don't see each other.
+        await cursor.execute("""
+            CREATE TEMP TABLE posts_staging (
+                post_url VARCHAR(255),
+                unique_id VARCHAR(255),
+                content_type BOOLEAN,
+                download_path VARCHAR(255),
+                description TEXT,
+                account_name VARCHAR(255)
+            ) ON COMMIT DROP;
+            """)
+        await cursor.execute("""
+            CREATE TEMP TABLE accounts_staging (
+                account_name VARCHAR(255),
+                account_url VARCHAR(255),
+                follower_number BIGINT,
+                newest_post_id VARCHAR(255)
+            ) ON COMMIT DROP;
+            """)
+
+    async def copy_rows(self, cursor: AsyncCursor, table: str,
+                        columns: Tuple[str, ...], rows: List[List]) -> None:
+        async with cursor.copy(f"COPY {table} ({', '.join(columns)}) "
+                               f"FROM STDIN") as copy:
+            for row in rows:
+                await copy.write_row(row)
+
+    async def merge_post_data(self, cursor: AsyncCursor) -> None:
+        merge_query = """
             INSERT INTO posts (post_url, unique_id,
-            content_type, download_path, description) 
-            VALUES %s
-            ON CONFLICT (unique_id) DO NOTHING
+            content_type, download_path, description, account_id)
+            SELECT DISTINCT ON (staged.unique_id) staged.post_url,
+            staged.unique_id, staged.content_type, staged.download_path,
+            staged.description, accounts.id
+            FROM posts_staging AS staged
+            JOIN accounts ON accounts.account_name = staged.account_name
+            ON CONFLICT DO NOTHING
         """
-        execute_values(self.cursor, insert_query, post_insert_data)
-        self.conn.commit()
+        await cursor.execute(merge_query)
 
-    def write_account_data(self, account_data: List[List]):
-        insert_query = """
+    async def merge_account_data(self, cursor: AsyncCursor) -> None:
+        merge_query = """
             INSERT INTO accounts (account_name, account_url,
-            follower_number, posts_scraped) 
-            VALUES %s
-            ON CONFLICT (account_url) DO NOTHING
+            follower_number, posts_scraped, last_crawled_at, newest_post_id)
+            SELECT DISTINCT ON (account_url) account_name, account_url,
+            follower_number, TRUE, NOW(), newest_post_id
+            FROM accounts_staging
+            ON CONFLICT (account_url) DO UPDATE
+            SET follower_number = COALESCE(NULLIF(EXCLUDED.follower_number, 0),
+                                           accounts.follower_number),
+            posts_scraped = TRUE,
+            last_crawled_at = NOW(),
+            newest_post_id = COALESCE(EXCLUDED.newest_post_id,
+                                      accounts.newest_post_id)
         """
-
-        execute_values(self.cursor, insert_query, account_data)
-        self.conn.commit()
-
-        account_names = [a[0] for a in account_data]
-        logger.info(f"Written Accounts Data To Database With {account_names}")
\ No newline at end of file
+        await cursor.execute(merge_query)
@@ -0,0 +1,43 @@
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timezone
+import json
+import os
+
+from db.export import START_KEYS
+
+Watermark = Tuple[datetime, Any]
+
+START_TIME = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Any]:
+    if not os.path.isfile(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(manifest_path: str, manifest: Dict[str, Any]) -> None:
+    # Written next to the target and renamed, a crash never leaves a
+    # half-written manifest behind.
+    temp_path = f"{manifest_path}.part"
+    with open(temp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, default=str)
+    os.replace(temp_path, manifest_path)
+
+
+def get_watermark(manifest: Dict[str, Any], table: str) -> Watermark:
+    """Rows are exported in ``(timestamp, key)`` order, every row up to the
+    watermark is already in the export."""
+    watermark = manifest.get("watermarks", {}).get(table)
+    if not watermark:
+        return START_TIME, START_KEYS[table]
+    return datetime.fromisoformat(watermark["timestamp"]), watermark["key"]
+
+
+def set_watermark(manifest: Dict[str, Any], table: str,
+                  watermark: Optional[Watermark]) -> None:
+    if watermark is not None:
+        timestamp, key = watermark
+        manifest.setdefault("watermarks", {})[table] = {
+            "timestamp": timestamp.isoformat(), "key": key}
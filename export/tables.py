@@ -0,0 +1,240 @@
+from typing import Any, Dict, List, Optional, TextIO
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import os
+
+from crawler.media_store import remove_file
+from db import close_db_pool
+from db.export import ExportDB, get_columns, get_row_watermark
+from export.manifest import (load_manifest, save_manifest, get_watermark,
+                             set_watermark)
+from utils.logger import get_logger
+from config.config import (ROOT_DIR, EXPORT_DIR, EXPORT_FORMAT,
+                           EXPORT_BATCH_SIZE, EXPORT_ROW_GROUP_SIZE,
+                           EXPORT_COMPRESSION)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = get_logger("export_logger")
+
+EXPORT_TABLES = ("posts", "accounts")
+EXPORT_FORMATS = ("parquet", "jsonl", "csv")
+
+
+def get_parquet_schema(table: str) -> "pa.Schema":
+    column_types = {
+        "id": pa.int64(),
+        "follower_number": pa.int64(),
+        "post_number": pa.int64(),
+        "content_type": pa.bool_(),
+        "following_scraped": pa.bool_(),
+        "posts_scraped": pa.bool_(),
+        "last_crawled_at": pa.timestamp("us", tz="UTC"),
+        "created_at": pa.timestamp("us", tz="UTC"),
+        "updated_at": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(column, column_types.get(column, pa.string()))
+                      for column in get_columns(table)])
+
+
+def open_text(file_path: str, compression: Optional[str]) -> TextIO:
+    if compression == "gzip":
+        return gzip.open(file_path, "wt", encoding="utf-8", newline="")
+    return open(file_path, "w", encoding="utf-8", newline="")
+
+
+class ParquetTableWriter:
+    """Buffers ``row_group_size`` rows per Parquet row group."""
+
+    def __init__(self, file_path: str, table: str, row_group_size: int,
+                 compression: Optional[str]):
+        if pq is None:
+            raise RuntimeError("pyarrow Is Required For Parquet Export, "
+                               "Install It With `pip install pyarrow`")
+        self.schema = get_parquet_schema(table)
+        self.row_group_size = row_group_size
+        self.writer = pq.ParquetWriter(file_path, self.schema,
+                                       compression=compression or "snappy")
+        self.rows: List[tuple] = []
+
+    def write(self, rows: List[tuple]) -> None:
+        self.rows.extend(rows)
+        while len(self.rows) >= self.row_group_size:
+            self.flush(self.rows[:self.row_group_size])
+            self.rows = self.rows[self.row_group_size:]
+
+    def flush(self, rows: List[tuple]) -> None:
+        columns = list(zip(*rows))
+        self.writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type)
+             for column, field in zip(columns, self.schema)],
+            schema=self.schema))
+
+    def close(self) -> None:
+        if self.rows:
+            self.flush(self.rows)
+            self.rows = []
+        self.writer.close()
+
+
+class JsonlTableWriter:
+    def __init__(self, file_path: str, table: str, row_group_size: int,
+                 compression: Optional[str]):
+        self.columns = get_columns(table)
+        self.file = open_text(file_path, compression)
+
+    def write(self, rows: List[tuple]) -> None:
+        self.file.writelines(
+            json.dumps(dict(zip(self.columns, row)), ensure_ascii=False,
+                       default=str) + "\n"
+            for row in rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class CsvTableWriter:
+    def __init__(self, file_path: str, table: str, row_group_size: int,
+                 compression: Optional[str]):
+        self.file = open_text(file_path, compression)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(get_columns(table))
+
+    def write(self, rows: List[tuple]) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+TABLE_WRITERS = {
+    "parquet": ParquetTableWriter,
+    "jsonl": JsonlTableWriter,
+    "csv": CsvTableWriter,
+}
+
+
+def get_extension(export_format: str, compression: Optional[str]) -> str:
+    if export_format != "parquet" and compression == "gzip":
+        return f"{export_format}.gz"
+    return export_format
+
+
+class TableExporter:
+    """Incremental export of ``posts`` and ``accounts`` to files.
+
+    Rows stream from a named (server-side) cursor ``batch_size`` at a time
+    straight into the writer, so memory doesn't grow with the table. Each
+    run writes one new file per table, holding the rows after that table's
+    watermark in ``manifest.json``, and moves the watermark forward.
+    """
+
+    def __init__(self, export_format: str=EXPORT_FORMAT,
+                 output_dir: str=EXPORT_DIR,
+                 batch_size: int=EXPORT_BATCH_SIZE,
+                 row_group_size: int=EXPORT_ROW_GROUP_SIZE,
+                 compression: Optional[str]=EXPORT_COMPRESSION):
+        if export_format not in TABLE_WRITERS:
+            raise ValueError(f"Unknown Export Format -> {export_format}")
+        self.export_format = export_format
+        self.output_dir = os.path.join(ROOT_DIR, output_dir, export_format)
+        self.manifest_path = os.path.join(self.output_dir, "manifest.json")
+        self.batch_size = max(batch_size, 1)
+        self.row_group_size = max(row_group_size, 1)
+        self.compression = compression or None
+
+    async def export_table(self, table: str,
+                           manifest: Dict[str, Any]) -> int:
+        watermark = get_watermark(manifest, table)
+        exported_at = datetime.now(timezone.utc)
+        file_name = f"{table}-{exported_at:%Y%m%dT%H%M%S%f}." \
+                    f"{get_extension(self.export_format, self.compression)}"
+        file_path = os.path.join(self.output_dir, file_name)
+        temp_path = f"{file_path}.part"
+
+        writer = TABLE_WRITERS[self.export_format](
+            temp_path, table, self.row_group_size, self.compression)
+        rows_number, last_row = 0, None
+        try:
+            async for rows in ExportDB().iter_batches(table, watermark,
+                                                      self.batch_size):
+                writer.write(rows)
+                rows_number += len(rows)
+                last_row = rows[-1]
+        finally:
+            writer.close()
+
+        if not rows_number:
+            remove_file(temp_path)
+            logger.info(f"No New {table} Rows To Export")
+            return 0
+
+        os.replace(temp_path, file_path)
+        manifest.setdefault("files", []).append({
+            "table": table,
+            "name": file_name,
+            "rows": rows_number,
+            "bytes": os.path.getsize(file_path),
+            "exported_at": exported_at.isoformat(),
+        })
+        set_watermark(manifest, table, get_row_watermark(table, last_row))
+        logger.info(f"Exported {rows_number} {table} Rows To {file_name}")
+        return rows_number
+
+    async def export(self, tables: List[str]=EXPORT_TABLES)\
+            -> Dict[str, int]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = load_manifest(self.manifest_path)
+        manifest["format"] = self.export_format
+        exported = {}
+        for table in tables:
+            try:
+                exported[table] = await self.export_table(table, manifest)
+            except Exception as export_error:
+                logger.error(f"Error Occurred While Exporting "
+                             f"{table} -> {export_error}")
+                remove_partial_files(self.output_dir)
+                exported[table] = 0
+            # Saved after every table, its file and watermark go together.
+            save_manifest(self.manifest_path, manifest)
+        return exported
+
+
+def remove_partial_files(output_dir: str) -> None:
+    for file_name in os.listdir(output_dir):
+        if file_name.endswith(".part"):
+            remove_file(os.path.join(output_dir, file_name))
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        await TableExporter(args.format, args.output, args.batch_size,
+                            args.row_group_size,
+                            args.compression).export(args.tables)
+    finally:
+        await close_db_pool()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Export the posts and accounts tables")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        default=EXPORT_FORMAT)
+    parser.add_argument("--tables", nargs="+", choices=EXPORT_TABLES,
+                        default=list(EXPORT_TABLES))
+    parser.add_argument("--output", default=EXPORT_DIR)
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--row-group-size", type=int,
+                        default=EXPORT_ROW_GROUP_SIZE)
+    parser.add_argument("--compression", default=EXPORT_COMPRESSION,
+                        help="Parquet codec (snappy, zstd, gzip, none) or "
+                             "gzip for jsonl/csv")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,186 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import io
+import json
+import os
+import tarfile
+
+from crawler.media_store import remove_file
+from db import close_db_pool
+from db.export import ExportDB, get_columns, get_row_watermark
+from export.manifest import (Watermark, load_manifest, save_manifest,
+                             get_watermark, set_watermark)
+from utils.logger import get_logger
+from config.config import (ROOT_DIR, EXPORT_DIR, EXPORT_SHARD_SIZE,
+                           EXPORT_WORKERS)
+
+logger = get_logger("export_logger")
+
+
+def get_sample_json(row: Dict[str, Any]) -> bytes:
+    return json.dumps({
+        "unique_id": row["unique_id"],
+        "post_url": row["post_url"],
+        "account": row["account_name"],
+        "follower_number": row["follower_number"],
+        "caption": row["description"] or "",
+        "content_type": "image" if row["content_type"] else "video",
+        "created_at": row["created_at"].isoformat(),
+    }, ensure_ascii=False).encode("utf-8")
+
+
+def add_member(tar: tarfile.TarFile, name: str, data: bytes,
+               mtime: float) -> None:
+    member = tarfile.TarInfo(name)
+    member.size = len(data)
+    member.mtime = mtime
+    member.mode = 0o644
+    tar.addfile(member, io.BytesIO(data))
+
+
+def write_shard(shard_path: str, rows: List[tuple]) -> Dict[str, Any]:
+    """Pack ``rows`` into one WebDataset tar, ``<key>.jpg`` + ``<key>.json``.
+
+    Runs in a worker process. Samples whose media file is missing are left
+    out and counted, a shard without any sample isn't kept.
+    """
+    temp_path = f"{shard_path}.part"
+    samples, missing = 0, 0
+    with tarfile.open(temp_path, "w") as tar:
+        for values in rows:
+            row = dict(zip(get_columns("posts"), values))
+            media_path = os.path.join(ROOT_DIR, row["download_path"])
+            try:
+                with open(media_path, "rb") as media_file:
+                    media = media_file.read()
+            except OSError:
+                missing += 1
+                continue
+
+            # WebDataset splits keys at the first dot, so ids never have one.
+            key = row["unique_id"].replace(".", "_")
+            extension = os.path.splitext(media_path)[1].lstrip(".") or "jpg"
+            mtime = row["created_at"].timestamp()
+            add_member(tar, f"{key}.{extension}", media, mtime)
+            add_member(tar, f"{key}.json", get_sample_json(row), mtime)
+            samples += 1
+
+    if samples:
+        os.replace(temp_path, shard_path)
+    else:
+        os.remove(temp_path)
+    return {
+        "name": os.path.basename(shard_path),
+        "samples": samples,
+        "missing": missing,
+        "bytes": os.path.getsize(shard_path) if samples else 0,
+        "first_key": rows[0][0],
+        "last_key": rows[-1][0],
+    }
+
+
+class WebDatasetExporter:
+    """Incremental export of downloaded posts into WebDataset tar shards.
+
+    Posts are streamed from a server-side cursor in ``(created_at,
+    unique_id)`` order and cut into shards of ``shard_size`` posts, which
+    worker processes pack in parallel. ``manifest.json`` lists the shards
+    and holds the watermark: the key of the last exported post. A re-run
+    only exports posts stored after it, into new shards.
+    """
+
+    def __init__(self, output_dir: str=EXPORT_DIR,
+                 shard_size: int=EXPORT_SHARD_SIZE,
+                 workers: int=EXPORT_WORKERS):
+        self.output_dir = os.path.join(ROOT_DIR, output_dir, "webdataset")
+        self.manifest_path = os.path.join(self.output_dir, "manifest.json")
+        self.shard_size = max(shard_size, 1)
+        self.workers = max(workers, 1)
+
+    def get_shard_path(self, index: int) -> str:
+        return os.path.join(self.output_dir, f"shard-{index:06d}.tar")
+
+    async def export(self) -> int:
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = load_manifest(self.manifest_path)
+        manifest.setdefault("format", "webdataset")
+        shards: List[Dict[str, Any]] = manifest.setdefault("shards", [])
+        watermark = get_watermark(manifest, "posts")
+        logger.info(f"Exporting Posts After {watermark} To "
+                    f"{self.output_dir}")
+
+        loop = asyncio.get_running_loop()
+        # Bounds the batches held in memory while the workers are busy.
+        slots = asyncio.Semaphore(self.workers * 2)
+        tasks: List[asyncio.Future] = []
+        last_keys: List[Watermark] = []
+
+        async def pack(executor: ProcessPoolExecutor, index: int,
+                       rows: List[tuple]) -> Dict[str, Any]:
+            try:
+                shard = await loop.run_in_executor(
+                    executor, write_shard, self.get_shard_path(index), rows)
+                shard["index"] = index
+                return shard
+            finally:
+                slots.release()
+
+        first_index = shards[-1]["index"] + 1 if shards else 0
+        with ProcessPoolExecutor(self.workers) as executor:
+            index = first_index
+            async for rows in ExportDB().iter_batches(
+                    "posts", watermark, self.shard_size,
+                    "AND posts.download_path <> ''"):
+                await slots.acquire()
+                tasks.append(asyncio.ensure_future(pack(executor, index,
+                                                        rows)))
+                last_keys.append(get_row_watermark("posts", rows[-1]))
+                index += 1
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        exported = len(shards)
+        new_watermark, written = None, 0
+        for index, (shard, last_key) in enumerate(zip(results, last_keys)):
+            # Shards after a failed one are dropped so the watermark never
+            # skips posts, the next run exports them again.
+            if isinstance(shard, BaseException):
+                logger.error(f"Error Occurred While Writing Shard -> {shard}")
+                break
+            if shard["samples"]:
+                shard["exported_at"] = datetime.now(timezone.utc).isoformat()
+                shards.append(shard)
+            new_watermark = last_key
+            written = index + 1
+
+        for index in range(written, len(results)):
+            remove_file(self.get_shard_path(first_index + index))
+
+        set_watermark(manifest, "posts", new_watermark)
+        save_manifest(self.manifest_path, manifest)
+
+        samples = sum(shard["samples"] for shard in shards[exported:])
+        logger.info(f"Exported {samples} Samples Into "
+                    f"{len(shards) - exported} Shards, {len(shards)} Shards "
+                    f"In Total")
+        return samples
+
+
+async def main(args: Optional[argparse.Namespace]=None) -> None:
+    try:
+        await WebDatasetExporter(args.output, args.shard_size,
+                                 args.workers).export()
+    finally:
+        await close_db_pool()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Export downloaded posts as WebDataset tar shards")
+    parser.add_argument("--output", default=EXPORT_DIR)
+    parser.add_argument("--shard-size", type=int, default=EXPORT_SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,346 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import monotonic, perf_counter, time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from utils.logger import get_logger
+from config.config import METRICS_HOST, METRICS_PORT
+
+logger = get_logger("crawler_logger")
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')\
+        .replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape_label(value)}"'
+                     for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """Base of the metric types, rendered in the Prometheus text format.
+
+    Recording is a dict update on the event loop, the text is only built
+    when ``/metrics`` is scraped, so unscraped metrics cost next to nothing.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str,
+                 label_names: Sequence[str]=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+
+    def get_key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        pass
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}",
+                 f"# TYPE {self.name} {self.kind}"]
+        for name, values, value in self.samples():
+            names = self.label_names + (("le",) if name.endswith("_bucket")
+                                        else ())
+            lines.append(f"{name}{format_labels(names, values)} "
+                         f"{format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str,
+                 label_names: Sequence[str]=()):
+        super().__init__(name, description, label_names)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float=1, **labels) -> None:
+        key = self.get_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        for key, value in self.values.items():
+            yield self.name, key, value
+
+
+class Gauge(Metric):
+    """Set directly, or read at scrape time from ``set_function``, which
+    returns ``{label values: value}``."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str,
+                 label_names: Sequence[str]=()):
+        super().__init__(name, description, label_names)
+        self.values: Dict[LabelValues, float] = {}
+        self.function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self.get_key(labels)] = value
+
+    def inc(self, amount: float=1, **labels) -> None:
+        key = self.get_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float=1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Optional[
+            Callable[[], Dict[LabelValues, float]]]) -> None:
+        self.function = function
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        values = dict(self.values)
+        if self.function is not None:
+            try:
+                values.update(self.function())
+            except Exception as gauge_error:
+                logger.error(f"Error Occurred While Reading Gauge "
+                             f"{self.name} -> {gauge_error}")
+        for key, value in values.items():
+            yield self.name, key, value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str,
+                 label_names: Sequence[str]=(),
+                 buckets: Sequence[float]=LATENCY_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per bucket counts (+Inf last), sum, count]
+        self.values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self.get_key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0,
+                                        0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start_time, **labels)
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),),
+                                           counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key + (format_value(bound),), \
+                    cumulative
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, count
+
+
+class HourlyRate:
+    """Events in the last hour, kept in one minute buckets."""
+
+    def __init__(self):
+        self.buckets = [0] * 60
+        self.minutes = [0] * 60
+
+    def add(self, amount: int=1) -> None:
+        minute = int(monotonic() // 60)
+        slot = minute % 60
+        if self.minutes[slot] != minute:
+            self.minutes[slot], self.buckets[slot] = minute, 0
+        self.buckets[slot] += amount
+
+    def get(self) -> int:
+        minute = int(monotonic() // 60)
+        return sum(count for bucket_minute, count
+                   in zip(self.minutes, self.buckets)
+                   if minute - bucket_minute < 60)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, description: str,
+            label_names: Sequence[str]=()) -> Counter:
+    return registry.register(Counter(name, description, label_names))
+
+
+def gauge(name: str, description: str,
+          label_names: Sequence[str]=()) -> Gauge:
+    return registry.register(Gauge(name, description, label_names))
+
+
+def histogram(name: str, description: str, label_names: Sequence[str]=(),
+              buckets: Sequence[float]=LATENCY_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, description, label_names,
+                                       buckets))
+
+
+START_TIME = gauge("crawler_start_time_seconds",
+                   "Unix time the crawler process started")
+START_TIME.set(time())
+
+REQUESTS = counter("crawler_requests_total",
+                   "HTTP requests and page navigations by stage and status",
+                   ("stage", "status"))
+REQUEST_SECONDS = histogram("crawler_request_seconds",
+                            "Latency of navigations, metadata fetches and "
+                            "media downloads", ("stage",))
+DOWNLOADED_BYTES = counter("crawler_downloaded_bytes_total",
+                           "Media bytes downloaded into the media store",
+                           ("stage",))
+
+QUEUE_DEPTH = gauge("crawler_queue_depth",
+                    "Accounts waiting in front of each pipeline stage",
+                    ("queue",))
+BROWSER_PAGES = gauge("crawler_browser_pages",
+                      "Browser pages of the pool by state", ("state",))
+BROWSER_LAUNCHES = counter("crawler_browser_launches_total",
+                           "Browser (re)launches")
+
+ACCOUNTS_SCRAPED = counter("crawler_accounts_scraped_total",
+                           "Accounts whose posts were written")
+POSTS_STORED = counter("crawler_posts_stored_total",
+                       "Posts passed to the database")
+ACCOUNTS_DISCOVERED = counter("crawler_accounts_discovered_total",
+                              "Accounts found in following lists")
+THROUGHPUT = gauge("crawler_per_hour",
+                   "Accounts scraped and posts stored in the last hour",
+                   ("kind",))
+accounts_per_hour, posts_per_hour = HourlyRate(), HourlyRate()
+THROUGHPUT.set_function(lambda: {("accounts",): accounts_per_hour.get(),
+                                 ("posts",): posts_per_hour.get()})
+
+DB_SECONDS = histogram("db_operation_seconds",
+                       "Latency of database operations",
+                       ("operation",))
+DB_ROWS = counter("db_rows_written_total", "Rows sent to the database",
+                  ("table",))
+DB_ERRORS = counter("db_errors_total", "Failed database operations",
+                    ("operation",))
+
+COOKIES_VALID = gauge("cookies_valid",
+                      "1 when the saved cookies hold a logged in session")
+LOGINS = counter("cookies_logins_total", "Account logins by result",
+                 ("result",))
+
+
+class RequestTracker:
+    def __init__(self):
+        self.status = "error"
+
+
+@contextmanager
+def track_request(stage: str) -> Iterator[RequestTracker]:
+    """Count one request of ``stage`` and time it. The status stays
+    ``error`` unless the block sets ``tracker.status`` from a response."""
+    tracker = RequestTracker()
+    start_time = perf_counter()
+    try:
+        yield tracker
+    finally:
+        REQUESTS.inc(stage=stage, status=tracker.status)
+        REQUEST_SECONDS.observe(perf_counter() - start_time, stage=stage)
+
+
+def record_written(accounts: int, posts: int) -> None:
+    ACCOUNTS_SCRAPED.inc(accounts)
+    POSTS_STORED.inc(posts)
+    accounts_per_hour.add(accounts)
+    posts_per_hour.add(posts)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=registry.render().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+class MetricsServer:
+    def __init__(self, host: str=METRICS_HOST, port: int=METRICS_PORT):
+        self.host = host
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"Metrics Served On "
+                    f"http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+metrics_server: Optional[MetricsServer] = None
+
+
+async def start_metrics_server() -> None:
+    """Serve ``/metrics`` unless ``METRICS_PORT`` is ``0``."""
+    global metrics_server
+    if metrics_server is not None or not METRICS_PORT:
+        return
+    server = MetricsServer()
+    try:
+        await server.start()
+    except OSError as metrics_error:
+        logger.error(f"Error Occurred While Starting Metrics "
+                     f"Server -> {metrics_error}")
+        return
+    metrics_server = server
+
+
+async def close_metrics_server() -> None:
+    global metrics_server
+    if metrics_server is not None:
+        await metrics_server.close()
+        metrics_server = None